@@ -3,7 +3,8 @@ import json
 import os
 import datetime
 import time
-from logic import WorkplaceOptimizer
+from logic import ResultCache, create_optimizer, create_solver_pool, default_pool_size, get_compiled_optimizer
+from plan_store import PlanStore
 
 # ==========================================
 # 0. 全局配置与样式优化
@@ -57,6 +58,28 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+@st.cache_resource
+def get_solver_pool(rules_version, _optimizer):
+    """每个规则版本只创建一次求解进程池，规则随进程启动传送一次；单核机器上并行没有收益，返回 None"""
+    if (os.cpu_count() or 1) < 2:
+        return None
+    return create_solver_pool(_optimizer, max_workers=default_pool_size())
+
+
+@st.cache_resource
+def get_result_cache():
+    """进程内共享的结果缓存：相同的干员数据和布局配置直接返回上次的结果"""
+    return ResultCache(max_bytes=64 * 1024 * 1024)
+
+
+@st.cache_resource
+def get_plan_store(rules_version):
+    """磁盘上的方案存储，重启和多个进程之间共享；规则版本变化时整批清除旧记录"""
+    store = PlanStore("plans.sqlite3")
+    store.purge_stale(rules_version)
+    return store
+
+
 def get_timestamp():
     return datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
@@ -319,50 +342,45 @@ if col_action.button("🚀 生成排班方案", type="primary", use_container_wi
                 st.write("📥 读取干员练度数据...")
                 time.sleep(0.3)  # 模拟I/O延迟
 
-                with open("temp_ops.json", "wb") as f:
-                    f.write(operators_bytes)
-
                 progress_bar.progress(10)
 
                 # --- 阶段 2: 配置解析 (25%) ---
                 st.write("⚙️ 解析基建布局配置...")
                 time.sleep(0.4)
 
-                with open("temp_conf.json", "w", encoding='utf-8') as f:
-                    json.dump(current_config, f, ensure_ascii=False)
-
                 progress_bar.progress(25)
 
                 # --- 阶段 3: 算法初始化 (40%) ---
                 st.write("🧠 加载 WorkplaceOptimizer 核心算法...")
                 # 模拟加载大型模型的延迟
                 time.sleep(0.6)
-                optimizer = WorkplaceOptimizer("efficiency.json", "temp_ops.json", "temp_conf.json")
+                # 规则在进程内只编译一次（文件变化时自动重新编译）；干员数据和配置直接在内存中传入，多个会话互不干扰
+                compiled = get_compiled_optimizer(base_efficiency_path)
+                optimizer = create_optimizer(base_efficiency_path, operators_bytes, current_config)
 
                 progress_bar.progress(40)
 
-                # --- 阶段 4: 计算当前最优解 (65%) ---
-                st.write("📊 正在演算当前练度最优解 (Monte Carlo / Greedy)...")
-                time.sleep(0.8)  # 模拟复杂计算
-                curr = optimizer.get_optimal_assignments(ignore_elite=False)
-
-                progress_bar.progress(65)
-
-                # --- 阶段 5: 计算理论极限 (85%) ---
-                st.write("🔮 正在推演理论极限模型...")
-                time.sleep(0.5)
-                pot = optimizer.get_optimal_assignments(ignore_elite=True)
+                # --- 阶段 4: 同时计算当前最优解与理论极限 (85%) ---
+                st.write("📊 正在演算当前练度最优解与理论极限模型 (Monte Carlo / Greedy)...")
+                pool = get_solver_pool(compiled.rules_version, compiled)
+                # 逐班贪心 + 32 次随机重启，再对最优方案做 6000 步局部搜索；结果只由种子和次数决定，
+                # 时间预算只是安全上限
+                record = get_plan_store(compiled.rules_version).get_or_solve(
+                    optimizer, executor=pool, cache=get_result_cache(), solver="monte_carlo",
+                    restarts=32, seed=0, time_limit=10.0, improve_time=5.0, improve_moves=6000)
+                curr, pot, upgrades = record['current'], record['potential'], record['upgrades']
 
                 progress_bar.progress(85)
 
-                # --- 阶段 6: 差异分析与报告生成 (95%) ---
+                # --- 阶段 5: 差异分析与报告生成 (95%) ---
                 st.write("📈 生成练度提升路径分析报告...")
-                upgrades = optimizer.calculate_upgrade_requirements(curr, pot)
 
 
-                # 结果处理逻辑
+                # 结果处理逻辑：下载文件只保留 MAA 排班格式的字段，求解统计等诊断信息只留在 session state 中
+                MAA_KEYS = ('author', 'title', 'description', 'buildingType', 'planTimes', 'plans')
+
                 def clean(d):
-                    return {k: v for k, v in d.items() if k != 'raw_results'}
+                    return {k: d[k] for k in MAA_KEYS if k in d}
 
 
                 # 生成 TXT 内容
@@ -391,14 +409,13 @@ if col_action.button("🚀 生成排班方案", type="primary", use_container_wi
                     "curr": json.dumps(clean(curr), ensure_ascii=False, indent=2),
                     "pot": json.dumps(clean(pot), ensure_ascii=False, indent=2),
                     "txt": txt,
-                    "eff": curr['raw_results'][0].total_efficiency if curr['raw_results'] else 0
+                    "eff": curr['room_efficiency'][0]['total_efficiency'] if curr['room_efficiency'] else 0,
+                    "daily": curr['daily_efficiency'],
+                    "shifts": curr['shift_efficiency'],
+                    "greedy": curr['solver_stats'][0]['greedy_value']
                 }
                 st.session_state.calculated = True
 
-                # 清理临时文件
-                if os.path.exists("temp_ops.json"): os.remove("temp_ops.json")
-                if os.path.exists("temp_conf.json"): os.remove("temp_conf.json")
-
                 # --- 完成 (100%) ---
                 progress_bar.progress(100)
                 time.sleep(0.2)  # 稍微停顿一下让用户看到100%
@@ -427,7 +444,9 @@ if st.session_state.calculated:
     # 关键指标展示
     m1, m2, m3 = st.columns(3)
     m1.metric("首班总效率", f"{res['eff']:.2f}%", delta="当前练度")
-    m2.metric("排班方案", "3班轮换", help="固定为3班倒模式")
+    m2.metric("全天干员效率", f"{res['daily']:.0f}%",
+              delta=f"较贪心 +{res['daily'] - res.get('greedy', res['daily']):.0f}%",
+              help="3班轮换，各班次: " + " / ".join(f"{x:.0f}%" for x in res['shifts']))
     m3.metric("基建类型", f"{n_trading}{n_manufacture}{9 - n_trading - n_manufacture}")
 
     st.markdown("#### 📥 方案下载")
@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Any, Dict, IO, Iterable, Iterator, Optional
+
+from logic import WorkplaceOptimizer, create_solver_pool, get_compiled_optimizer, get_pool_optimizer
+from plan_store import PlanStore
+
+
+# ----------------- 批量求解 -----------------
+
+def read_jsonl(stream: IO[str]) -> Iterator[Dict[str, Any]]:
+    """逐行读取 JSONL 输入，不会一次性读入整个文件；无法解析的行产出 {"error": ...}"""
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            record = {"error": f"第 {line_no} 行不是有效的 JSON: {e}"}
+        if not isinstance(record, dict):
+            record = {"error": f"第 {line_no} 行不是 JSON 对象"}
+        record.setdefault("line", line_no)
+        yield record
+
+
+def solve_record(record: Dict[str, Any], solver_options: Dict[str, Any],
+                 optimizer: Optional[WorkplaceOptimizer] = None) -> Dict[str, Any]:
+    """
+    计算一条输入记录，返回可直接写出的输出记录（见 iter_batch）。
+    可作为 create_solver_pool 进程池的任务函数：optimizer 为 None 时使用子进程启动时传入的优化器，
+    序列化在子进程中完成，只把 JSON 结构传回父进程。
+    """
+    optimizer = optimizer or get_pool_optimizer()
+    current, potential, upgrades = optimizer.solve_both_modes(
+        record.get("operators", []), record.get("config") or {}, **solver_options)
+    return {
+        "id": record.get("id"),
+        "line": record.get("line"),
+        "current": PlanStore.serialize_assignments(current),
+        "potential": PlanStore.serialize_assignments(potential),
+        "upgrades": upgrades,
+    }
+
+
+def iter_batch(records: Iterable[Dict[str, Any]], efficiency_file: str = "efficiency.json",
+               workers: Optional[int] = None, max_pending: Optional[int] = None, vector_engine: bool = False,
+               **solver_options) -> Iterator[Dict[str, Any]]:
+    """
+    批量计算多份干员数据的当前练度方案、潜在方案和提升建议，按完成顺序逐条产出。
+    - 输入记录格式：{"id": 任意标识, "operators": MAA 导出的干员列表, "config": 布局配置（可省略）}；
+    - 规则只编译一次；workers > 1 时使用 create_solver_pool 的进程池，各记录在子进程中计算；
+    - 同时在途的记录不超过 max_pending（默认 workers 的 2 倍），输入按需读取，内存占用与输入规模无关；
+    - 输出记录：{"id", "line", "current", "potential", "upgrades"}，方案为 MAA 格式并附带 room_efficiency；
+      出错的记录输出 {"id", "line", "error"}，不影响其余记录。
+    :param vector_engine: 房间搜索使用 NumPy 引擎（见 VectorRoomEngine），规则很多时更快，结果相同
+    :param solver_options: 传给 get_optimal_assignments 的求解参数（如 solver="joint"）
+    """
+    compiled = get_compiled_optimizer(efficiency_file)
+    if vector_engine:
+        # 在副本上打开，不影响进程内共享的已编译优化器；进程池把候选表导出到共享内存，子进程直接读取
+        compiled = compiled.fork([], {}, vector_engine=True)
+    workers = workers or os.cpu_count() or 1
+
+    def error(record: Dict[str, Any], message: str) -> Dict[str, Any]:
+        return {"id": record.get("id"), "line": record.get("line"), "error": message}
+
+    if workers <= 1:
+        for record in records:
+            if "error" in record:
+                yield error(record, record["error"])
+                continue
+            try:
+                yield solve_record(record, solver_options, compiled)
+            except Exception as e:
+                yield error(record, f"{type(e).__name__}: {e}")
+        return
+
+    max_pending = max_pending or 2 * workers
+    pool = create_solver_pool(compiled, max_workers=workers)
+    try:
+        pending = {}
+        source = iter(records)
+        exhausted = False
+        while pending or not exhausted:
+            # 补充在途任务直到上限，出错的输入行直接产出
+            while not exhausted and len(pending) < max_pending:
+                record = next(source, None)
+                if record is None:
+                    exhausted = True
+                elif "error" in record:
+                    yield error(record, record["error"])
+                else:
+                    future = pool.submit(solve_record, record, solver_options)
+                    pending[future] = {"id": record.get("id"), "line": record.get("line")}
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                record = pending.pop(future)
+                try:
+                    yield future.result()
+                except Exception as e:
+                    yield error(record, f"{type(e).__name__}: {e}")
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def run_batch(input_stream: IO[str], output_stream: IO[str], efficiency_file: str = "efficiency.json",
+              workers: Optional[int] = None, max_pending: Optional[int] = None, vector_engine: bool = False,
+              **solver_options) -> Dict[str, Any]:
+    """读取 JSONL 输入、逐条写出 JSONL 结果（每条写完即刷新），返回处理统计"""
+    started = time.perf_counter()
+    stats = {"records": 0, "errors": 0}
+    for result in iter_batch(read_jsonl(input_stream), efficiency_file, workers, max_pending, vector_engine,
+                             **solver_options):
+        output_stream.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+        output_stream.flush()
+        stats["records"] += 1
+        stats["errors"] += "error" in result
+    stats["elapsed"] = time.perf_counter() - started
+    return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="批量生成 MAA 基建排班：读取 JSONL 格式的干员数据与配置，逐条输出方案与提升建议")
+    parser.add_argument("input", nargs="?", default="-", help="输入 JSONL 文件，默认读取标准输入")
+    parser.add_argument("-o", "--output", default="-", help="输出 JSONL 文件，默认写到标准输出")
+    parser.add_argument("-e", "--efficiency", default="efficiency.json", help="规则文件")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="工作进程数，默认等于 CPU 核数")
+    parser.add_argument("--max-pending", type=int, default=None, help="同时在途的记录数上限，默认工作进程数的 2 倍")
+    parser.add_argument("--solver", default="greedy",
+                        choices=["greedy", "exact", "joint", "randomized", "monte_carlo", "portfolio"],
+                        help="求解模式：greedy / exact / joint / randomized / monte_carlo / portfolio")
+    parser.add_argument("--time-limit", type=float, default=None, help="搜索类求解模式的时间预算（秒）")
+    parser.add_argument("--vector-engine", action="store_true",
+                        help="房间搜索使用 NumPy 引擎（需要 numpy），规则文件很大时更快，结果相同")
+    args = parser.parse_args(argv)
+
+    solver_options = {"solver": args.solver}
+    if args.time_limit is not None:
+        solver_options["time_limit"] = args.time_limit
+    input_stream = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8-sig")
+    output_stream = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        stats = run_batch(input_stream, output_stream, args.efficiency, args.workers, args.max_pending,
+                          args.vector_engine, **solver_options)
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        if output_stream is not sys.stdout:
+            output_stream.close()
+    print(f"完成 {stats['records']} 条，失败 {stats['errors']} 条，耗时 {stats['elapsed']:.1f} 秒", file=sys.stderr)
+    return 1 if stats["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,25 @@
+import copy
 import datetime
+import hashlib
 import json
-from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass, field
+import math
+import multiprocessing
+import os
+import pickle
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Any, Optional, Tuple, Union
+from dataclasses import dataclass, field, replace
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 只有 vector_engine 模式需要，未安装时房间搜索使用纯 Python 实现
+    np = None
 
 
 # ----------------- 数据类定义 -----------------
@@ -40,6 +58,14 @@ class OperatorEfficiency:
     apply_each: bool = False
     priority: int = 0
     products: List[str] = field(default_factory=list)
+    # [新增] 加载时预编译的规则元数据，搜索循环直接读取，不再对描述做字符串匹配
+    system_name: str = ""
+    rule_id: int = -1
+    operator_count: int = 0
+    is_automation: bool = False
+    has_purestream: bool = False
+    is_generic: bool = False  # 既不是自动化也不含清流的规则（门禁逻辑中的“通用”）
+    operator_mask: int = 0  # 规则干员的位掩码（见 WorkplaceOptimizer.operator_ids）
 
 
 @dataclass
@@ -68,6 +94,30 @@ class AssignmentResult:
     assignment_detail: List[Dict] = field(default_factory=list) # [新增] 详细分配信息
 
 
+@dataclass
+class RoomCandidate:
+    """精确求解中一个房间内可选的规则应用（组合规则整体，或 apply_each 规则中的单人）"""
+    rule: OperatorEfficiency
+    ops: List[str]
+    mask: int
+    efficiency: float
+    slots: int
+    kind: str  # 'norm' / 'each'，与 optimize_workplace_recursive 的记录类型一致
+    gate: int  # 0 中立(含清流) / 1 自动化 / 2 通用
+    usage_sensitive_mask: int  # 附属房间需求中本班开始时已上过 1 班的干员，本班再上班后需求即失效
+    collect_mask: int  # 房间结束后会被收集到中枢/宿舍/办公室的干员
+    requirement_mask: int = 0  # 附属房间需求涉及的全部干员
+    density: float = field(init=False)  # 每个位置的效率
+
+    def __post_init__(self):
+        self.density = self.efficiency / self.slots
+
+    @property
+    def plain(self) -> bool:
+        """不涉及附属房间收集和疲劳敏感需求的候选，可以在同类房间之间自由交换"""
+        return not (self.collect_mask or self.usage_sensitive_mask)
+
+
 @dataclass
 class ControlCenterRule:
     operators: List[str]
@@ -76,38 +126,283 @@ class ControlCenterRule:
     priority: int
     group: Optional[str] = None
     elite_requirements: Dict[str, int] = field(default_factory=dict)
+    operator_mask: int = 0
+
+
+# ----------------- 规则增量匹配 -----------------
+
+class RuleMatcher:
+    """
+    一组规则的增量匹配状态：通过 干员编号 -> 规则下标 的倒排索引，为每条规则维护不可用成员的计数，
+    干员上岗 (place) 时只更新包含该干员的规则，计数越过阈值的规则从可生效集合中移除。
+    组合规则要求全部成员可用（阈值 1），apply_each 规则只要有一名成员可用（阈值为成员数）；
+    fireable() 按原顺序返回当前可能生效的规则。
+    """
+
+    def __init__(self, rules: List[OperatorEfficiency], postings: Dict[int, List[int]], blocked: int):
+        self.rules = rules
+        self.postings = postings
+        self.blocked = blocked
+        self.blocked_counts = [(rule.operator_mask & blocked).bit_count() for rule in rules]
+        self.thresholds = [rule.operator_count if rule.apply_each else 1 for rule in rules]
+        # 规则下标 -> 规则，保持原顺序；删除为 O(1)
+        self._active: Dict[int, OperatorEfficiency] = {
+            i: rule for i, rule in enumerate(rules) if self.blocked_counts[i] < self.thresholds[i]}
+        self._fireable: Optional[List[OperatorEfficiency]] = None
+
+    def place(self, op_id: int):
+        bit = 1 << op_id
+        if self.blocked & bit:
+            return
+        self.blocked |= bit
+        for i in self.postings.get(op_id, ()):
+            self.blocked_counts[i] += 1
+            if self.blocked_counts[i] == self.thresholds[i]:
+                del self._active[i]
+                self._fireable = None
+
+    def fireable(self) -> List[OperatorEfficiency]:
+        if self._fireable is None:
+            self._fireable = list(self._active.values())
+        return self._fireable
+
+
+# ----------------- 房间搜索的 NumPy 引擎 -----------------
+
+class VectorRuleTable:
+    """
+    一个房间（类型、产物）按扫描顺序展开的候选表，全部由扁平数组组成，只取决于编译好的规则：
+    由 fork 出的优化器共享，进程池中由子进程直接读取共享内存中的同一份数组（见 export_vector_tables）。
+    组合规则整体作为一个候选，apply_each 规则中每人一个候选；成员和附属需求按 (候选下标, 干员编号, 练度要求)
+    平铺存放，持有、练度检查和疲劳检查都是对平铺数组的一次取值和按候选求和。
+    - first=False：optimize_workplace_recursive 的逐步扫描，候选按规则列表的顺序；
+    - first=True：_optimize_workplace 第一步的“通用”体系扫描，apply_each 规则只检查中枢和宿舍需求，
+      制造站中填不满剩余位置、又没有清流可用的自动化规则效率按剩余位置数分摊（calculate_adjusted_efficiency）。
+      扫描顺序依赖随配置调整的效率，由 VectorRoomEngine 按当前规则排出。
+    """
+
+    ARRAYS = ('rule_ids', 'member_rows', 'member_ids', 'member_elite', 'requirement_rows', 'requirement_ids',
+              'requirement_elite', 'synergy', 'priority', 'slots', 'each', 'automation', 'generic', 'shared')
+
+    def __init__(self, arrays: Dict[str, 'np.ndarray'], first: bool, meeting_room: bool):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.first = first
+        self.meeting_room = meeting_room
+        self.size = len(self.rule_ids)
+        self.max_id = int(max(self.member_ids.max(initial=0), self.requirement_ids.max(initial=0)))
+
+    @classmethod
+    def build(cls, optimizer: 'WorkplaceOptimizer', rules: List[OperatorEfficiency], workplace_type: str,
+              first: bool) -> 'VectorRuleTable':
+        columns: Dict[str, List] = {name: [] for name in cls.ARRAYS}
+        for rule in rules:
+            checked = rule.requires_control_center + rule.requires_dormitory
+            if not (first and rule.apply_each):
+                checked = checked + rule.requires_power_station + rule.requires_hire
+            groups = [[name] for name in rule.operators] if rule.apply_each else [rule.operators]
+            for ops in groups:
+                row = len(columns['rule_ids'])
+                columns['rule_ids'].append(rule.rule_id)
+                for name in ops:
+                    columns['member_rows'].append(row)
+                    columns['member_ids'].append(optimizer.intern_operator(name))
+                    columns['member_elite'].append(rule.elite_requirements.get(name, 0))
+                for req in checked:
+                    columns['requirement_rows'].append(row)
+                    columns['requirement_ids'].append(optimizer.intern_operator(req.operator))
+                    columns['requirement_elite'].append(req.elite_required)
+                columns['synergy'].append(rule.synergy_efficiency)
+                columns['priority'].append(rule.priority)
+                columns['slots'].append(len(ops))
+                columns['each'].append(rule.apply_each)
+                columns['automation'].append(rule.is_automation)
+                columns['generic'].append(rule.is_generic)
+                columns['shared'].append(first and not rule.apply_each and rule.is_automation
+                                         and not rule.has_purestream and workplace_type == 'manufacturing_station')
+        dtypes = {'synergy': np.float64, 'each': bool, 'automation': bool, 'generic': bool, 'shared': bool}
+        arrays = {name: np.array(values, dtype=dtypes.get(name, np.int64)) for name, values in columns.items()}
+        return cls(arrays, first, workplace_type == 'meeting_room')
+
+    def member_count(self, values: 'np.ndarray') -> 'np.ndarray':
+        """按候选汇总成员上的取值（values 为平铺成员数组上的 0/1 或数值）"""
+        return np.bincount(self.member_rows, weights=values, minlength=self.size)
+
+    def requirement_count(self, values: 'np.ndarray') -> 'np.ndarray':
+        return np.bincount(self.requirement_rows, weights=values, minlength=self.size)
+
+    def entry(self, i: int, optimizer: 'WorkplaceOptimizer') -> Tuple[OperatorEfficiency, List[str], str]:
+        """第 i 个候选的 (当前规则对象, 干员列表, 记录类型)"""
+        rule = optimizer.efficiency_rules[int(self.rule_ids[i])]
+        if not self.each[i]:
+            return rule, rule.operators, 'generic' if self.first else 'norm'
+        name = optimizer.operator_names[int(self.member_ids[np.searchsorted(self.member_rows, i)])]
+        return rule, [name], 'generic_each' if self.first else 'each'
+
+
+class VectorRoomEngine:
+    """
+    房间搜索的向量化实现（WorkplaceOptimizer 的 vector_engine 模式），面向规则很多的规则文件和批量求解。
+    候选表（VectorRuleTable）与干员数据和配置无关，按 (类型, 产物) 只构建一次；
+    本类只按当前干员数据和配置算出各候选的静态可行性（持有、练度、附属需求）和效率，每一步再用可用性位图
+    检查成员是否可用、附属需求是否疲劳，取单位效率最高者。同分时取扫描顺序靠前的候选，
+    选择结果与逐条规则扫描完全一致。
+    """
+
+    def __init__(self, optimizer: 'WorkplaceOptimizer', workplace: 'Workplace', ignore_elite: bool):
+        self.optimizer = optimizer
+        self.rest, self.first = optimizer.get_vector_tables(optimizer.get_workplace_type(workplace),
+                                                            workplace.current_product)
+        self.purestream_bit = 1 << optimizer.intern_operator('清流')
+        self.mask_bytes = max(self.rest.max_id, self.first.max_id) // 8 + 1
+        own, elite = optimizer.get_vector_roster()
+        # 后续步骤的会客室效率按当前练度计算，与 optimize_workplace_recursive 一致
+        self.rest_state = self._prepare(self.rest, own, elite, ignore_elite, False)
+        self.first_state = self._prepare(self.first, own, elite, ignore_elite, ignore_elite)
+        # 第一步按 (优先级, 效率) 从高到低扫描，同值保持规则顺序（与 sorted(..., reverse=True) 相同）
+        self.first_rank = np.empty(self.first.size, dtype=np.int64)
+        self.first_rank[np.lexsort((np.arange(self.first.size), -self.first_state[3], -self.first.priority))] = \
+            np.arange(self.first.size)
+
+    def _prepare(self, table: VectorRuleTable, own: 'np.ndarray', elite: 'np.ndarray', ignore_elite: bool,
+                 elite_for_bonus: bool) -> Tuple['np.ndarray', 'np.ndarray', 'np.ndarray', 'np.ndarray']:
+        """
+        (静态可行, 效率, 单位效率, 规则效率)：check_elite_requirements / check_room_requirements /
+        calculate_dynamic_efficiency 的向量化版本
+        """
+        member_elite = elite[table.member_ids]
+        bad = table.member_count(~own[table.member_ids])
+        requirement_bad = ~own[table.requirement_ids]
+        if not ignore_elite:
+            bad += table.member_count(member_elite < table.member_elite)
+            requirement_bad |= elite[table.requirement_ids] < table.requirement_elite
+        bad += table.requirement_count(requirement_bad)
+        static_ok = (bad == 0) & (table.slots > 0)
+
+        # 随配置调整的规则（清流效率）使用本实例的当前规则
+        synergy = table.synergy
+        for rule_id in self.optimizer.config_rule_ids:
+            rows = table.rule_ids == rule_id
+            if rows.any():
+                synergy = synergy.copy()
+                synergy[rows] = self.optimizer.efficiency_rules[rule_id].synergy_efficiency
+        efficiency = synergy
+        if table.meeting_room:
+            # 会客室：每人 5%，精一 8%、精二 16%；潜在方案按规则要求的练度计算
+            calc_elite = np.maximum(member_elite, table.member_elite) if elite_for_bonus else member_elite
+            bonus = 5 + np.where(calc_elite == 2, 16, np.where(calc_elite == 1, 8, 0))
+            efficiency = efficiency + table.member_count(bonus)
+        score = np.where(table.each, efficiency, efficiency / np.maximum(table.slots, 1))
+        return static_ok, efficiency, score, synergy
+
+    def _bits(self, mask: int) -> 'np.ndarray':
+        """干员位掩码 -> 按编号的 0/1 数组"""
+        data = (mask & ((1 << (self.mask_bytes * 8)) - 1)).to_bytes(self.mask_bytes, 'little')
+        return np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder='little')
+
+    def _feasible(self, table: VectorRuleTable, static_ok: 'np.ndarray', blocked: int, fatigued: int,
+                  remaining_slots: int) -> 'np.ndarray':
+        feasible = static_ok & (table.slots <= remaining_slots)
+        feasible &= table.member_count(self._bits(blocked)[table.member_ids]) == 0
+        if fatigued:
+            feasible &= table.requirement_count(self._bits(fatigued)[table.requirement_ids]) == 0
+        return feasible
+
+    def select_first(self, blocked: int, fatigued: int, remaining_slots: int
+                     ) -> Tuple[Optional[Dict[str, Any]], float]:
+        """与 _optimize_workplace 第一步的“通用”体系扫描相同的选择：(候选, 单位效率)，没有正收益的候选时为 (None, -1)"""
+        table = self.first
+        if not table.size:
+            return None, -1
+        static_ok, efficiency, scores, _ = self.first_state
+        if blocked & self.purestream_bit:
+            scores = np.where(table.shared & (table.slots < remaining_slots), efficiency / remaining_slots, scores)
+        scores = np.where(self._feasible(table, static_ok, blocked, fatigued, remaining_slots), scores, -np.inf)
+        best = scores.max()
+        if not best > 0:
+            return None, -1
+        tied = np.flatnonzero(scores == best)
+        i = int(tied[np.argmin(self.first_rank[tied])])
+        rule, ops, kind = table.entry(i, self.optimizer)
+        return {'type': kind, 'rule': rule, 'required': ops, 'efficiency': float(efficiency[i]),
+                'slots_used': len(ops)}, float(best)
+
+    def select(self, blocked: int, fatigued: int, remaining_slots: int,
+               room_has_automation: bool, room_has_generic: bool) -> Optional[Dict[str, Any]]:
+        """与 optimize_workplace_recursive 单步扫描相同的选择，没有可选候选时返回 None"""
+        table = self.rest
+        if not table.size:
+            return None
+        static_ok, efficiency, scores, _ = self.rest_state
+        feasible = self._feasible(table, static_ok, blocked, fatigued, remaining_slots)
+        if room_has_automation:
+            feasible &= ~table.generic
+        if room_has_generic:
+            feasible &= ~table.automation
+        scores = np.where(feasible, scores, -np.inf)
+        i = int(np.argmax(scores))
+        if not scores[i] > -1:
+            return None
+        rule, ops, kind = table.entry(i, self.optimizer)
+        return {'rule': rule, 'req': ops, 'eff': float(efficiency[i]), 'slots': len(ops), 'type': kind}
 
 
 # ----------------- 优化器类定义 -----------------
 
+def content_hash(data: Any) -> str:
+    """JSON 数据的内容摘要：键排序后序列化再取 SHA-256，与 dict 的键顺序无关"""
+    payload = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# 数据源：文件路径、JSON 原始字节，或已解析的 dict/list
+JsonSource = Union[str, bytes, bytearray, Dict[str, Any], List[Any]]
+
+
 class WorkplaceOptimizer:
-    def __init__(self, efficiency_file: str, operator_file: str, config_file: str = None, debug: bool = False):
+    def __init__(self, efficiency_file: JsonSource, operator_file: JsonSource, config_file: JsonSource = None,
+                 debug: bool = False, vector_engine: bool = False):
         self.efficiency_file = efficiency_file
         self.operator_file = operator_file
         self.config_file = config_file
         self.debug = debug
+        self.vector_engine = False
+        self.set_vector_engine(vector_engine)
 
         self.efficiency_data = self.load_json(efficiency_file)
+        # 规则数据的版本号（规范化 JSON 的摘要），用于区分不同版本规则下的缓存和进程池
+        self.rules_version = content_hash(self.efficiency_data)[:16]
         self.operator_data = self.load_json(operator_file)
         self.config_data = self.load_json(config_file) if config_file else {}
 
         self.trading_stations_count = self.config_data.get('trading_stations_count', 3)
         self.manufacturing_stations_count = self.config_data.get('manufacturing_stations_count', 3)
 
+        # 干员名 -> 整数编号，规则和可用性检查都使用位掩码
+        self.operator_ids: Dict[str, int] = {}
+        self.operator_names: List[str] = []
+        self._intern_lock = threading.Lock()
+        # NumPy 引擎的候选表只取决于规则，与编号表一样由 fork 出的优化器共享
+        self._vector_tables: Dict[Tuple[str, str], Tuple[VectorRuleTable, VectorRuleTable]] = {}
+
         self.operators = self.load_operators()
         self.efficiency_rules = self.load_efficiency_rules()
         self.cc_rules = self.load_cc_rules()
 
-        # 动态调整清流效率
-        for rule in self.efficiency_rules:
-            if rule.workplace_type == 'manufacturing_station' and rule.operators == ['清流']:
-                rule.synergy_efficiency = self.trading_stations_count * 20
-                break
+        self.apply_config_rules()
+
+        # 持有干员视图、规则索引与剪枝后的中枢规则，只在干员数据变化时重建
+        self.refresh_roster()
 
         self.workplaces = self.load_workplaces()
         self.fiammetta_targets = []
 
-    def load_json(self, file_path: str) -> Any:
+    def load_json(self, file_path: JsonSource) -> Any:
+        """读取 JSON 数据源：字符串视为文件路径，bytes 按 UTF-8 解析，dict/list 直接使用（不复制）"""
+        if isinstance(file_path, (bytes, bytearray)):
+            return json.loads(file_path.decode('utf-8-sig'))
+        if not isinstance(file_path, str):
+            return file_path
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 return json.load(f)
@@ -118,17 +413,42 @@ class WorkplaceOptimizer:
     def load_operators(self) -> Dict[str, Operator]:
         operators = {}
         for op_data in self.operator_data:
-            operators[op_data['name']] = Operator(
-                id=op_data['id'],
-                name=op_data['name'],
-                elite=op_data['elite'],
-                level=op_data['level'],
-                own=op_data['own'],
-                potential=op_data['potential'],
-                rarity=op_data['rarity']
-            )
+            operators[op_data['name']] = self.make_operator(op_data)
         return operators
 
+    def make_operator(self, op_data: Dict[str, Any]) -> Operator:
+        self.intern_operator(op_data['name'])
+        return Operator(
+            id=op_data['id'],
+            name=op_data['name'],
+            elite=op_data['elite'],
+            level=op_data['level'],
+            own=op_data['own'],
+            potential=op_data['potential'],
+            rarity=op_data['rarity']
+        )
+
+    def intern_operator(self, name: str) -> int:
+        """
+        返回干员名对应的整数编号，首次出现时分配新编号（规则中未持有的干员也会分配）。
+        编号表由 fork 出的优化器共享，分配新编号时加锁。
+        """
+        op_id = self.operator_ids.get(name)
+        if op_id is None:
+            with self._intern_lock:
+                op_id = self.operator_ids.get(name)
+                if op_id is None:
+                    op_id = len(self.operator_names)
+                    self.operator_names.append(name)
+                    self.operator_ids[name] = op_id
+        return op_id
+
+    def operators_to_mask(self, names) -> int:
+        mask = 0
+        for name in names:
+            mask |= 1 << self.intern_operator(name)
+        return mask
+
     def load_efficiency_rules(self) -> List[OperatorEfficiency]:
         expanded_rules: List[OperatorEfficiency] = []
 
@@ -178,7 +498,8 @@ class WorkplaceOptimizer:
                             requires_processing_station=parse_reqs('process'),
                             apply_each=rule_data.get('apply_each', False),
                             priority=rule_data.get('priority', 0),
-                            products=products
+                            products=products,
+                            system_name=system_name
                         ))
                 elif isinstance(system_data, dict):
                     # 处理复杂体系
@@ -229,12 +550,24 @@ class WorkplaceOptimizer:
                             requires_processing_station=parse_reqs_rule('process'),
                             apply_each=rule_data.get('apply_each', False),
                             priority=rule_data.get('priority', 0),
-                            products=p
+                            products=p,
+                            system_name=system_name
                         ))
 
         expanded_rules.sort(key=lambda r: (r.priority, r.synergy_efficiency), reverse=True)
+        self.compile_rule_metadata(expanded_rules)
         return expanded_rules
 
+    def compile_rule_metadata(self, rules: List[OperatorEfficiency]):
+        """预编译规则元数据（rule_id 即排序后的下标）"""
+        for rule_id, rule in enumerate(rules):
+            rule.rule_id = rule_id
+            rule.operator_count = len(rule.operators)
+            rule.is_automation = "自动化" in rule.system_name
+            rule.has_purestream = "清流" in rule.operators
+            rule.is_generic = not rule.is_automation and not rule.has_purestream
+            rule.operator_mask = self.operators_to_mask(rule.operators)
+
     def load_cc_rules(self) -> List[ControlCenterRule]:
         rules = []
         raw_rules = self.efficiency_data.get('control_center_rules', [])
@@ -294,11 +627,365 @@ class WorkplaceOptimizer:
                     elite_requirements=elites_dict
                 ))
 
+        for rule in rules:
+            rule.operator_mask = self.operators_to_mask(rule.operators)
+
         # 排序：优先处理优先级高(priority)的，其次效率高(efficiency)的
         # 你的心情干员 efficiency 只有 0.05，自然会排在贸易站加成(0.07)之后，作为填充物
         rules.sort(key=lambda x: (x.priority, x.efficiency), reverse=True)
         return rules
 
+    def apply_config_rules(self):
+        """
+        按配置调整规则：清流效率随贸易站数量变化。替换为新的规则对象，不修改共享的规则；
+        config_rule_ids 记录随配置调整的规则下标（NumPy 引擎的共享候选表中这些规则的效率按当前规则读取）
+        """
+        self.config_rule_ids: List[int] = []
+        for i, rule in enumerate(self.efficiency_rules):
+            if rule.workplace_type == 'manufacturing_station' and rule.operators == ['清流']:
+                self.config_rule_ids.append(i)
+                efficiency = self.trading_stations_count * 20
+                if rule.synergy_efficiency != efficiency:
+                    self.efficiency_rules = list(self.efficiency_rules)
+                    self.efficiency_rules[i] = replace(rule, synergy_efficiency=efficiency)
+                break
+
+    def set_vector_engine(self, enabled: bool):
+        """
+        房间搜索是否使用 NumPy 引擎（见 VectorRoomEngine）。结果与纯 Python 实现相同，
+        规则很多时更快；规则较少时构建和调用开销大于收益，默认关闭。需要安装 numpy。
+        """
+        if enabled and np is None:
+            raise ImportError("vector_engine 需要安装 numpy")
+        self.vector_engine = bool(enabled)
+        self._vector_engines: Dict[Tuple[str, str, bool], VectorRoomEngine] = {}
+        self._vector_roster: Optional[Tuple['np.ndarray', 'np.ndarray']] = None
+
+    def get_vector_tables(self, workplace_type: str, product: str) -> Tuple[VectorRuleTable, VectorRuleTable]:
+        """
+        (逐步扫描, 第一步“通用”体系扫描) 的候选表。使用该类型、产物下的全部规则（不按持有情况剪枝，
+        未持有的候选在 VectorRoomEngine 中静态排除），与干员数据和配置无关。
+        """
+        key = (workplace_type, product)
+        tables = self._vector_tables.get(key)
+        if tables is None:
+            rules = [r for r in self.efficiency_rules
+                     if r.workplace_type == workplace_type and (not r.products or product in r.products)]
+            first_rules = [rule for rule in rules if (rule.system_name or "通用") == "通用"]
+            tables = self._vector_tables[key] = (VectorRuleTable.build(self, rules, workplace_type, first=False),
+                                                 VectorRuleTable.build(self, first_rules, workplace_type, first=True))
+        return tables
+
+    def vector_table_keys(self) -> List[Tuple[str, str]]:
+        """规则中出现的全部 (类型, 产物) 键（与 build_rule_index 相同），用于预先构建全部候选表"""
+        keys = {}
+        for rule in self.efficiency_rules:
+            keys[(rule.workplace_type, "")] = None
+            for product in rule.products:
+                keys[(rule.workplace_type, product)] = None
+        return list(keys)
+
+    def get_vector_roster(self) -> Tuple['np.ndarray', 'np.ndarray']:
+        """按干员编号的 (是否持有, 精英化等级) 数组，干员数据变化或编号表增长后重建"""
+        roster = self._vector_roster
+        if roster is None or len(roster[0]) < len(self.operator_names):
+            owned = self.get_owned_operators()
+            ids = np.array([self.intern_operator(name) for name in owned], dtype=np.int64)
+            own = np.zeros(len(self.operator_names), dtype=bool)
+            elite = np.zeros(len(self.operator_names), dtype=np.int64)
+            own[ids] = True
+            elite[ids] = [op.elite for op in owned.values()]
+            roster = self._vector_roster = (own, elite)
+        return roster
+
+    def get_vector_engine(self, workplace: Workplace, ignore_elite: bool) -> VectorRoomEngine:
+        key = (self.get_workplace_type(workplace), workplace.current_product, ignore_elite)
+        engine = self._vector_engines.get(key)
+        if engine is None:
+            engine = self._vector_engines[key] = VectorRoomEngine(self, workplace, ignore_elite)
+        return engine
+
+    def fork(self, operator_data: Optional[JsonSource] = None,
+             config_data: Optional[JsonSource] = None, vector_engine: Optional[bool] = None) -> 'WorkplaceOptimizer':
+        """
+        基于已编译的规则创建独立的优化器。规则、中枢规则和干员编号表只读共享，
+        干员数据、配置、房间产物和菲亚梅塔目标等求解状态各自独立，互不影响。
+        :param operator_data: 干员数据，为 None 时沿用本实例的数据
+        :param config_data: 配置，为 None 时沿用本实例的配置
+        :param vector_engine: 是否使用 NumPy 房间引擎，为 None 时沿用本实例的设置
+        """
+        worker = copy.copy(self)
+        if vector_engine is not None:
+            worker.set_vector_engine(vector_engine)
+        if operator_data is not None:
+            worker.operator_data = self.load_json(operator_data)
+        if config_data is not None:
+            worker.config_data = self.load_json(config_data)
+        worker.trading_stations_count = worker.config_data.get('trading_stations_count', 3)
+        worker.manufacturing_stations_count = worker.config_data.get('manufacturing_stations_count', 3)
+        worker.apply_config_rules()
+        worker.operators = worker.load_operators()
+        worker.refresh_roster()
+        worker.workplaces = worker.load_workplaces()
+        worker.fiammetta_targets = []
+        return worker
+
+    def configure(self, config_data: JsonSource):
+        """
+        切换布局配置（房间数量、产物分配等），保留与配置无关的状态：规则不变时（清流效率只随贸易站数量变化）
+        规则索引和房间置换表继续使用，同一份干员数据在相邻配置之间可以复用房间结果。
+        """
+        self.config_data = self.load_json(config_data)
+        self.trading_stations_count = self.config_data.get('trading_stations_count', 3)
+        self.manufacturing_stations_count = self.config_data.get('manufacturing_stations_count', 3)
+        rules = self.efficiency_rules
+        self.apply_config_rules()
+        if self.efficiency_rules is not rules:
+            self.refresh_roster()
+        self.workplaces = self.load_workplaces()
+        self.fiammetta_targets = []
+
+    def solve(self, operator_data: Optional[JsonSource] = None, config_data: Optional[JsonSource] = None,
+              ignore_elite: bool = False, solver: str = "greedy", cache: Optional['ResultCache'] = None,
+              **solver_options) -> Dict[str, Any]:
+        """
+        无副作用的求解入口：在 fork 出的副本上调用 get_optimal_assignments，不修改本实例的任何状态，
+        同一个已加载的优化器可以被多个线程同时调用。
+        :param cache: 结果缓存；相同规则版本、干员数据、配置和参数的请求直接返回缓存结果
+        """
+        worker = self.fork(operator_data, config_data)
+        if cache is not None:
+            key = worker.result_key('solve', ignore_elite=ignore_elite, solver=solver, **solver_options)
+            result = cache.get(key)
+            if result is None:
+                result = worker.get_optimal_assignments(ignore_elite=ignore_elite, solver=solver, **solver_options)
+                cache.put(key, result)
+            return result
+        return worker.get_optimal_assignments(ignore_elite=ignore_elite, solver=solver, **solver_options)
+
+    def solve_both_modes(self, operator_data: Optional[JsonSource] = None, config_data: Optional[JsonSource] = None,
+                         executor=None, cache: Optional['ResultCache'] = None,
+                         **solver_options) -> Tuple[Dict[str, Any], Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        同时计算当前练度方案、潜在方案和练度提升建议，结果与依次调用两种模式再计算提升建议相同。
+        :param executor: create_solver_pool 创建的进程池；给出时潜在方案在子进程中计算，当前方案在本进程中同时计算；
+                         monte_carlo / portfolio 模式下两种练度依次计算，各自把重启 / 策略分给进程池
+        :param cache: 结果缓存，三项结果作为一个条目缓存
+        :return: (当前练度方案, 潜在方案, 提升建议)
+        """
+        worker = self.fork(operator_data, config_data)
+        if cache is not None:
+            key = worker.result_key('both_modes', **solver_options)
+            result = cache.get(key)
+            if result is None:
+                result = worker._solve_both_modes(executor, solver_options)
+                cache.put(key, result)
+            return result
+        return worker._solve_both_modes(executor, solver_options)
+
+    def result_key(self, kind: str, **params) -> str:
+        """结果缓存的键：规则版本、干员数据、配置、调用类型和求解参数的规范化 JSON 摘要"""
+        return content_hash([self.rules_version, kind, self.operator_data, self.config_data, params])
+
+    def _solve_both_modes(self, executor, solver_options: Dict[str, Any]
+                          ) -> Tuple[Dict[str, Any], Dict[str, Any], List[Dict[str, Any]]]:
+        """solve_both_modes 的实际计算，在 fork 出的副本上调用"""
+        if executor is not None and solver_options.get('solver') in ("monte_carlo", "portfolio"):
+            # 这两种模式自己把重启 / 策略分给进程池，两种练度依次计算，各自占满进程池
+            current = self.get_optimal_assignments(ignore_elite=False, executor=executor, **solver_options)
+            potential = self.get_optimal_assignments(ignore_elite=True, executor=executor, **solver_options)
+            return current, potential, self.calculate_upgrade_requirements(current, potential)
+        future = None
+        if executor is not None:
+            future = executor.submit(_solve_in_pool, self.operator_data, self.config_data, True, solver_options)
+        current = self.get_optimal_assignments(ignore_elite=False, **solver_options)
+        if future is not None:
+            potential = future.result()
+            # 提升建议使用潜在模式下的菲亚梅塔充能对象，与依次调用时一致
+            self.resolve_fiammetta_targets(ignore_elite=True)
+        else:
+            potential = self.get_optimal_assignments(ignore_elite=True, **solver_options)
+        upgrades = self.calculate_upgrade_requirements(current, potential)
+        return current, potential, upgrades
+
+    def __copy__(self):
+        # fork 基于浅复制：编号表与编号锁一起共享，不能走下面只用于序列化的 __getstate__ / __setstate__
+        worker = object.__new__(type(self))
+        worker.__dict__.update(self.__dict__)
+        return worker
+
+    def __getstate__(self):
+        # 进程池初始化时整体传给子进程，锁不能序列化，到子进程后重建
+        state = self.__dict__.copy()
+        del state['_intern_lock']
+        # NumPy 候选表由进程池通过共享内存提供（见 SolverPool），或在子进程中按需重建
+        state['_vector_tables'] = {}
+        state['_vector_engines'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._intern_lock = threading.Lock()
+
+    def refresh_roster(self):
+        """干员数据（持有情况）变化后调用：重建持有干员缓存、持有位掩码、规则索引和中枢规则"""
+        self._owned_operators: Optional[Dict[str, Operator]] = None
+        self.owned_mask = self.operators_to_mask(self.get_owned_operators())
+        self.rule_index = self.build_rule_index()
+        self._rule_postings: Dict[Tuple[str, str], Dict[int, List[int]]] = {}
+        # 中枢填充只遍历成员全部持有的规则；互斥组判断仍使用完整的 cc_rules
+        self.active_cc_rules = [r for r in self.cc_rules if not r.operator_mask & ~self.owned_mask]
+        # 房间置换表依赖持有情况和练度，随干员数据一起重建
+        self._room_relevant: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        self._room_cache: Dict[Tuple, AssignmentResult] = {}
+        self.room_cache_stats = {'hits': 0, 'misses': 0}
+        self._vector_engines = {}
+        self._vector_roster = None
+
+    def apply_roster_diff(self, changes: List[Dict[str, Any]]) -> Tuple[List[str], int]:
+        """
+        合并一组干员数据（MAA 导出格式的条目，覆盖已有条目或新增），只让受影响的缓存失效：
+        房间置换表中，变化干员不是该 (类型, 产物) 任何规则的附属需求、且作为成员时在条目的状态下本来就不可用的
+        房间结果继续保留，其余失效。只有精英化等级变化时，按持有情况建立的规则索引保持不变，不再重建。
+        会修改本实例的状态，请在 fork 出的优化器（如 create_optimizer 的返回值）上调用。
+        :return: (持有情况或精英化等级有变化的干员, 被移除的房间结果条数)
+        """
+        # 同名干员可能有多个条目（如阿米娅的不同形态），按 id 对应，没有 id 时按干员名
+        by_key = {entry.get('id', entry['name']): entry for entry in changes}
+        self.operator_data = [by_key.pop(entry.get('id', entry['name']), entry) for entry in self.operator_data] + \
+            list(by_key.values())
+        # 只重建涉及的干员（同名时以最后一个条目为准，与 load_operators 相同）
+        names = {entry['name'] for entry in changes}
+        latest = {entry['name']: entry for entry in self.operator_data if entry['name'] in names}
+        previous = self.operators
+        self.operators = dict(previous)
+        for name, entry in latest.items():
+            self.operators[name] = self.make_operator(entry)
+
+        own_changed, elite_changed = set(), set()
+        for name in names:
+            before, after = previous.get(name), self.operators.get(name)
+            owned_before, owned_after = bool(before and before.own), bool(after and after.own)
+            if owned_before != owned_after:
+                own_changed.add(name)
+            elif owned_after and before.elite != after.elite:
+                elite_changed.add(name)
+
+        changed = sorted(own_changed | elite_changed)
+        if not changed:
+            self._owned_operators = None
+            return changed, 0
+
+        room_cache, room_stats = self._room_cache, self.room_cache_stats
+        if own_changed:
+            self.refresh_roster()
+            self.room_cache_stats = room_stats
+        else:
+            self._owned_operators = None
+            self._room_cache = {}
+            self._vector_engines = {}
+            self._vector_roster = None
+        changed_mask = self.operators_to_mask(changed)
+        # 按全部规则（不论是否持有）统计各 (类型, 产物) 的成员和附属需求干员：新持有的干员会让原本被剔除的规则重新生效
+        room_masks: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        for key, result in room_cache.items():
+            room = (key[0], key[1])
+            masks = room_masks.get(room)
+            if masks is None:
+                member_any, req_any = self.operators_to_mask(['清流']), 0
+                for rule in self.efficiency_rules:
+                    if rule.workplace_type == key[0] and (not rule.products or key[1] in rule.products):
+                        member_any |= rule.operator_mask
+                        req_any |= self.operators_to_mask(
+                            r.operator for r in rule.requires_control_center + rule.requires_dormitory +
+                            rule.requires_power_station + rule.requires_hire + rule.requires_processing_station)
+                masks = room_masks[room] = (member_any & changed_mask, req_any & changed_mask)
+            member_changed, req_changed = masks
+            # 附属需求涉及变化干员时结果失效；只作为成员涉及时，若这些干员在该条目的状态下本来就不可用，结果仍然有效
+            # （会客室效率随精英化等级变化，也属于成员情况，两种练度模式一并处理）
+            if not req_changed and not member_changed & ~key[3]:
+                self._room_cache[key] = result
+        return changed, len(room_cache) - len(self._room_cache)
+
+    def replan(self, changes: List[Dict[str, Any]], ignore_elite: bool = False, **solver_options) -> Dict[str, Any]:
+        """
+        增量重新规划：合并干员数据的变化（见 apply_roster_diff）后重新求解。
+        与变化干员无关的房间直接命中之前求解时留下的房间结果，只有受影响的房间（以及因此改变了可用干员的
+        后续房间和班次）重新计算。solver_stats 末尾记录变化的干员、失效条数和本次的房间命中情况。
+        """
+        changed, evicted = self.apply_roster_diff(changes)
+        hits, misses = self.room_cache_stats['hits'], self.room_cache_stats['misses']
+        result = self.get_optimal_assignments(ignore_elite=ignore_elite, **solver_options)
+        result.setdefault('solver_stats', []).append({
+            'incremental': True, 'changed': changed, 'evicted': evicted,
+            'room_hits': self.room_cache_stats['hits'] - hits, 'room_misses': self.room_cache_stats['misses'] - misses,
+        })
+        return result
+
+    def replan_both_modes(self, changes: List[Dict[str, Any]], **solver_options
+                          ) -> Tuple[Dict[str, Any], Dict[str, Any], List[Dict[str, Any]]]:
+        """增量版本的 solve_both_modes：合并干员数据的变化后重新计算当前练度方案、潜在方案和提升建议"""
+        current = self.replan(changes, ignore_elite=False, **solver_options)
+        potential = self.replan([], ignore_elite=True, **solver_options)
+        upgrades = self.calculate_upgrade_requirements(current, potential)
+        return current, potential, upgrades
+
+    def rule_can_fire(self, rule: OperatorEfficiency) -> bool:
+        """
+        规则是否可能在当前持有干员下生效（只看是否持有，不看练度和班次）。
+        apply_each 规则只要有一人持有即可；中枢/宿舍需求在所有搜索路径中都会检查，
+        发电站/办公室需求只在非 apply_each 路径中全部检查，因此只对组合规则据此剪枝。
+        """
+        unowned = ~self.owned_mask
+        reqs = rule.requires_control_center + rule.requires_dormitory
+        if rule.apply_each:
+            if not rule.operator_mask & self.owned_mask:
+                return False
+        else:
+            if rule.operator_mask & unowned:
+                return False
+            reqs = reqs + rule.requires_power_station + rule.requires_hire
+        return not self.operators_to_mask(r.operator for r in reqs) & unowned
+
+    def build_rule_index(self) -> Dict[Tuple[str, str], List[OperatorEfficiency]]:
+        """
+        建立 (工作站类型, 产物) -> 规则列表 的索引，并剔除涉及未持有干员、不可能生效的规则。
+        列表保持 efficiency_rules 的既有排序；未限定产物的规则会出现在该类型的每个产物下，
+        键 (类型, "") 只包含未限定产物的规则，用于未设置产物或未知产物的房间。
+        """
+        products_by_type: Dict[str, set] = {}
+        for rule in self.efficiency_rules:
+            products_by_type.setdefault(rule.workplace_type, {""}).update(rule.products)
+
+        active_rules = [r for r in self.efficiency_rules if self.rule_can_fire(r)]
+        index: Dict[Tuple[str, str], List[OperatorEfficiency]] = {}
+        for workplace_type, products in products_by_type.items():
+            for product in products:
+                index[(workplace_type, product)] = [
+                    r for r in active_rules
+                    if r.workplace_type == workplace_type and (not r.products or product in r.products)
+                ]
+        return index
+
+    def get_rule_postings(self, workplace_type: str, product: str) -> Dict[int, List[int]]:
+        """get_rules 列表的倒排索引：干员编号 -> 包含该干员的规则在列表中的下标"""
+        key = (workplace_type, product)
+        postings = self._rule_postings.get(key)
+        if postings is None:
+            postings = {}
+            for i, rule in enumerate(self.get_rules(workplace_type, product)):
+                for name in dict.fromkeys(rule.operators):
+                    postings.setdefault(self.operator_ids[name], []).append(i)
+            self._rule_postings[key] = postings
+        return postings
+
+    def get_rules(self, workplace_type: str, product: str) -> List[OperatorEfficiency]:
+        """按工作站类型和当前产物查询已排序的规则列表"""
+        rules = self.rule_index.get((workplace_type, product))
+        if rules is None:
+            rules = self.rule_index.get((workplace_type, ""), [])
+        return rules
+
     def load_workplaces(self) -> Dict[str, List[Workplace]]:
         # 保持原有的 load_workplaces 逻辑
         workplaces = {
@@ -333,8 +1020,32 @@ class WorkplaceOptimizer:
 
         return workplaces
 
+    def get_owned_operators(self) -> Dict[str, Operator]:
+        """持有干员 name -> Operator 的缓存视图，干员数据变化时由 refresh_roster 失效"""
+        if self._owned_operators is None:
+            self._owned_operators = {op.name: op for op in self.operators.values() if op.own}
+        return self._owned_operators
+
     def get_available_operators(self) -> List[Operator]:
-        return [op for op in self.operators.values() if op.own]
+        return list(self.get_owned_operators().values())
+
+    def get_blocked_mask(self, workplace_type: str, operator_usage: Dict[str, int], *used_name_sets: set) -> int:
+        """
+        计算当前房间不可用干员的位掩码：未持有、已在传入集合中（本班次/本房间已上班）、或累计班次已满。
+        贸易站中的菲亚梅塔充能对象最多可以上 3 班，其余干员最多 2 班。
+        未持有部分取反表示，因此未登记编号的干员也视为不可用。
+        """
+        blocked = ~self.owned_mask
+        for names in used_name_sets:
+            blocked |= self.operators_to_mask(names)
+
+        fia_mask = self.operators_to_mask(self.fiammetta_targets) if workplace_type == 'trading_station' else 0
+        for name, count in operator_usage.items():
+            if count >= 2:
+                bit = 1 << self.intern_operator(name)
+                if count >= 3 or not bit & fia_mask:
+                    blocked |= bit
+        return blocked
 
     # --------------- 核心修改：增加 ignore_elite 参数 ---------------
 
@@ -424,14 +1135,58 @@ class WorkplaceOptimizer:
 
     def optimize_workplace(self, workplace: Workplace, operator_usage: Dict[str, int],
                            shift_used_names: set, ignore_elite: bool = False) -> AssignmentResult:
-        """优化单个工作站的干员配置，增加 ignore_elite 参数"""
-        available_ops = self.get_available_operators()
-        op_by_name = {op.name: op for op in available_ops}
+        """
+        优化单个工作站的干员配置，结果按置换表缓存。
+        房间结果只取决于规则列表（类型、产物）、位置数、相关干员（规则成员、附属需求干员和清流）
+        在本房间是否可用、附属需求干员是否已满 2 班，以及练度模式；键相同时直接复用结果并重放状态更新。
+        """
         workplace_type = self.get_workplace_type(workplace)
+        relevant = self._room_relevant.get((workplace_type, workplace.current_product))
+        if relevant is None:
+            rules = self.get_rules(workplace_type, workplace.current_product)
+            member_mask = self.operators_to_mask(['清流'])
+            req_mask = 0
+            for rule in rules:
+                member_mask |= rule.operator_mask
+                req_mask |= self.operators_to_mask(
+                    r.operator for r in rule.requires_control_center + rule.requires_dormitory +
+                    rule.requires_power_station + rule.requires_hire + rule.requires_processing_station)
+            relevant = self._room_relevant[(workplace_type, workplace.current_product)] = (member_mask, req_mask)
+
+        member_mask, req_mask = relevant
+        blocked = self.get_blocked_mask(workplace_type, operator_usage, shift_used_names)
+        fatigued = self.operators_to_mask(n for n, c in operator_usage.items() if c >= 2)
+        key = (workplace_type, workplace.current_product, workplace.max_operators,
+               blocked & member_mask, fatigued & req_mask, ignore_elite)
+
+        cached = self._room_cache.get(key)
+        if cached is None:
+            self.room_cache_stats['misses'] += 1
+            result = self._optimize_workplace(workplace, operator_usage, shift_used_names, ignore_elite)
+            if len(self._room_cache) > 20000:
+                self._room_cache.clear()
+            self._room_cache[key] = result
+            return result
+
+        self.room_cache_stats['hits'] += 1
+        for op in cached.optimal_operators:
+            shift_used_names.add(op.name)
+            operator_usage[op.name] += 1
+        return replace(
+            cached, workplace=workplace, total_efficiency=workplace.base_efficiency + cached.operator_efficiency,
+            optimal_operators=list(cached.optimal_operators), applied_combinations=list(cached.applied_combinations),
+            applied_rules=list(cached.applied_rules), assignment_detail=list(cached.assignment_detail)
+        )
 
-        def rule_matches_products(rule: OperatorEfficiency) -> bool:
-            if not rule.products: return True
-            return workplace.current_product in rule.products
+    def room_cache_info(self) -> Dict[str, int]:
+        """房间置换表的命中/未命中次数和条目数"""
+        return dict(self.room_cache_stats, entries=len(self._room_cache))
+
+    def _optimize_workplace(self, workplace: Workplace, operator_usage: Dict[str, int],
+                            shift_used_names: set, ignore_elite: bool = False) -> AssignmentResult:
+        """优化单个工作站的干员配置，增加 ignore_elite 参数"""
+        op_by_name = self.get_owned_operators()
+        workplace_type = self.get_workplace_type(workplace)
 
         remaining_slots = workplace.max_operators
         assigned_ops: List[Operator] = []
@@ -445,16 +1200,13 @@ class WorkplaceOptimizer:
             'control': [], 'dorm': [], 'power': [], 'hire': [], 'process': []
         }
 
-        all_rules = [r for r in self.efficiency_rules if
-                     r.workplace_type == workplace_type and rule_matches_products(r)]
+        all_rules = self.get_rules(workplace_type, workplace.current_product)
+        blocked = self.get_blocked_mask(workplace_type, operator_usage, shift_used_names)
 
+        # 分组只用于下面“通用”体系的逐条扫描，NumPy 引擎使用自己的候选表
         system_groups = {}
-        for rule in all_rules:
-            sys_name = "通用"
-            for sys_key in self.efficiency_data['combination_rules'].get(workplace_type, {}):
-                if sys_key in rule.description:
-                    sys_name = sys_key
-                    break
+        for rule in (() if self.vector_engine else all_rules):
+            sys_name = rule.system_name or "通用"
             if sys_name not in system_groups: system_groups[sys_name] = []
             system_groups[sys_name].append(rule)
 
@@ -476,16 +1228,15 @@ class WorkplaceOptimizer:
             base_eff = base_total_eff / len(required_ops)
 
             # 判断是否是自动化体系
-            is_automation = "自动化" in rule.description
+            is_automation = rule.is_automation
 
             # 检查清流是否可用（不在当前规则中，但库存里有）
             purestream_available = False
-            if '清流' in op_by_name and '清流' not in shift_used_names and '清流' not in used_names:
-                if operator_usage.get('清流', 0) < 2:  # 假设清流没满班
-                    purestream_available = True
+            if not blocked & (1 << self.intern_operator('清流')):  # 持有、本班未上且没满班
+                purestream_available = True
 
             # 如果规则本身包含清流，那自然是可用的
-            if '清流' in required_ops:
+            if rule.has_purestream:
                 purestream_available = True
 
             if is_automation and workplace_type == 'manufacturing_station':
@@ -575,9 +1326,9 @@ class WorkplaceOptimizer:
 
                 # 4. 检查精英化等级
                 if not ignore_elite:
-                    if "孑0体系" in rule.description:
+                    if rule.system_name == "孑0体系":
                         if not any(op.name == "孑" and op.elite == 0 for op in op_objs if op.name == "孑"): continue
-                    elif "孑12体系" in rule.description:
+                    elif rule.system_name == "孑12体系":
                         if not any(
                             op.name == "孑" and op.elite in [1, 2] for op in op_objs if op.name == "孑"): continue
 
@@ -604,6 +1355,11 @@ class WorkplaceOptimizer:
 
         # ----------------- 2. 评估通用 -----------------
         generic_rules = system_groups.get("通用", [])
+        if self.vector_engine:
+            # NumPy 引擎一次算出全部候选，结果与下面的逐条规则扫描相同
+            best_candidate, best_efficiency = self.get_vector_engine(workplace, ignore_elite).select_first(
+                blocked, self.operators_to_mask(n for n, c in operator_usage.items() if c >= 2), remaining_slots)
+            generic_rules = ()
         for rule in generic_rules:
             # ... (这部分的逻辑通常不需要改，因为通用干员不排斥其他人) ...
             # 但为了保持代码一致性，我们看下是否有影响。通常不需要动。
@@ -612,10 +1368,7 @@ class WorkplaceOptimizer:
 
             if rule.apply_each:
                 for op_name in rule.operators:
-                    max_usage = 3 if op_name in self.fiammetta_targets and workplace_type == 'trading_station' else 2
-                    if (
-                            remaining_slots <= 0 or op_name in used_names or op_name in shift_used_names or op_name not in op_by_name or operator_usage.get(
-                        op_name, 0) >= max_usage): continue
+                    if remaining_slots <= 0 or blocked & (1 << self.operator_ids[op_name]): continue
 
                     op_obj = op_by_name[op_name]
                     req_elite = {op_name: rule.elite_requirements.get(op_name, 0)}
@@ -632,10 +1385,7 @@ class WorkplaceOptimizer:
                                           'efficiency': eff, 'slots_used': 1}
             else:
                 required = rule.operators
-                max_check = lambda n: 3 if n in self.fiammetta_targets and workplace_type == 'trading_station' else 2
-                if any(n not in op_by_name or n in used_names or n in shift_used_names or operator_usage.get(n,
-                                                                                                             0) >= max_check(
-                        n) for n in required) or len(required) > remaining_slots:
+                if rule.operator_mask & blocked or rule.operator_count > remaining_slots:
                     continue
 
                 op_objs = [op_by_name[n] for n in required]
@@ -715,8 +1465,7 @@ class WorkplaceOptimizer:
 
     def optimize_workplace_recursive(self, workplace, operator_usage, shift_used_names, assigned_ops, used_names,
                                      remaining_slots, applied_combinations, ignore_elite, applied_rules_list):
-        available_ops = self.get_available_operators()
-        op_by_name = {op.name: op for op in available_ops}
+        op_by_name = self.get_owned_operators()
         workplace_type = self.get_workplace_type(workplace)
 
         local_synergy = 0
@@ -730,56 +1479,55 @@ class WorkplaceOptimizer:
         room_has_generic = False
 
         for r in applied_rules_list:
-            # 判断规则是否属于自动化体系
-            is_auto = "自动化" in r.description
-            # 判断规则是否包含清流（清流是中立的，既兼容自动化也兼容通用）
-            is_pure = "清流" in r.operators
-
-            if is_auto:
+            # 清流是中立的，既兼容自动化也兼容通用；既不是自动化又不含清流的才是通用规则
+            if r.is_automation:
                 room_has_automation = True
-            elif not is_pure:
-                # 如果既不是自动化规则，又不包含清流，那就是通用规则
+            elif r.is_generic:
                 room_has_generic = True
 
         # 如果逻辑正常，room_has_automation 和 room_has_generic 不应同时为 True
         # 但如果发生了，优先视作自动化房（因为通用效率已被清空）
 
-        def rule_matches_products(rule):
-            if not rule.products: return True
-            return workplace.current_product in rule.products
+        # 只遍历当前可能生效的规则，干员上岗后通过倒排索引增量更新；
+        # NumPy 引擎直接读取候选表的数组，匹配器只用于维护不可用干员的位掩码
+        blocked = self.get_blocked_mask(workplace_type, operator_usage, shift_used_names, used_names)
+        engine = self.get_vector_engine(workplace, ignore_elite) if self.vector_engine else None
+        if engine is not None:
+            matcher = RuleMatcher([], {}, blocked)
+            fatigued = self.operators_to_mask(n for n, c in operator_usage.items() if c >= 2)
+        else:
+            matcher = RuleMatcher(self.get_rules(workplace_type, workplace.current_product),
+                                  self.get_rule_postings(workplace_type, workplace.current_product), blocked)
 
         while remaining_slots > 0:
             best_cand = None
             best_eff = -1
+            blocked = matcher.blocked
 
-            all_rules = [r for r in self.efficiency_rules if
-                         r.workplace_type == workplace_type and rule_matches_products(r)]
+            candidate_rules = matcher.fireable()
+            if engine is not None:
+                # NumPy 引擎一次算出全部候选，结果与下面的逐条规则扫描相同
+                best_cand = engine.select(blocked, fatigued, remaining_slots, room_has_automation, room_has_generic)
+                candidate_rules = ()
 
-            for rule in all_rules:
+            for rule in candidate_rules:
                 # --- 严格的互斥逻辑 (Gate Keeper) ---
 
-                rule_is_auto = "自动化" in rule.description
-                rule_has_pure = "清流" in rule.operators
-                rule_is_generic = not rule_is_auto and not rule_has_pure
-
                 # 门禁 1: 如果房间已经是自动化房，严禁放入通用干员
                 if room_has_automation:
-                    if rule_is_generic:
+                    if rule.is_generic:
                         continue  # 跳过通用干员
 
                 # 门禁 2: 如果房间已经是通用房，严禁放入自动化干员
                 if room_has_generic:
-                    if rule_is_auto:
+                    if rule.is_automation:
                         continue  # 跳过自动化干员
 
                 # -----------------------------------
 
                 if rule.apply_each:
                     for op_name in rule.operators:
-                        max_usage = 3 if op_name in self.fiammetta_targets and workplace_type == 'trading_station' else 2
-                        if (
-                                op_name in used_names or op_name in shift_used_names or op_name not in op_by_name or operator_usage.get(
-                            op_name, 0) >= max_usage): continue
+                        if blocked & (1 << self.operator_ids[op_name]): continue
 
                         op_obj = op_by_name[op_name]
                         req_elite = {op_name: rule.elite_requirements.get(op_name, 0)}
@@ -795,12 +1543,7 @@ class WorkplaceOptimizer:
                             best_cand = {'rule': rule, 'req': [op_name], 'eff': best_eff, 'slots': 1, 'type': 'each'}
                 else:
                     req = rule.operators
-                    if len(req) > remaining_slots: continue
-                    max_check = lambda \
-                        n: 3 if n in self.fiammetta_targets and workplace_type == 'trading_station' else 2
-                    if any(n in used_names or n in shift_used_names or n not in op_by_name or operator_usage.get(n,
-                                                                                                                 0) >= max_check(
-                        n) for n in req): continue
+                    if rule.operator_count > remaining_slots: continue
 
                     op_objs = [op_by_name[n] for n in req]
                     if (not self.check_elite_requirements(op_objs, rule.elite_requirements, ignore_elite) or
@@ -810,10 +1553,10 @@ class WorkplaceOptimizer:
                             not self.check_room_requirements(rule.requires_hire, operator_usage, ignore_elite)): continue
 
                     real_eff = self.calculate_dynamic_efficiency(rule, op_objs, workplace_type)
-                    eff_per = real_eff / len(req)
+                    eff_per = real_eff / rule.operator_count
                     if eff_per > best_eff:
                         best_eff = eff_per
-                        best_cand = {'rule': rule, 'req': req, 'eff': real_eff, 'slots': len(req),
+                        best_cand = {'rule': rule, 'req': req, 'eff': real_eff, 'slots': rule.operator_count,
                                      'type': 'norm'}
 
             if best_cand:
@@ -824,13 +1567,16 @@ class WorkplaceOptimizer:
                     used_names.add(n)
                     shift_used_names.add(n)
                     operator_usage[n] += 1
+                    matcher.place(self.operator_ids[n])
+                    if engine is not None and operator_usage[n] >= 2:
+                        fatigued |= 1 << self.operator_ids[n]
                 remaining_slots -= best_cand['slots']
                 local_synergy += best_cand['eff']
                 local_rules.append(rule)
                 # 更新当前递归层级的房间状态，影响下一次循环
-                if "自动化" in rule.description:
+                if rule.is_automation:
                     room_has_automation = True
-                elif "清流" not in rule.operators:  # 非自动化且非清流
+                elif rule.is_generic:  # 非自动化且非清流
                     room_has_generic = True
 
                 desc = f"{rule.description}({', '.join(req)})" if best_cand['type'] == 'each' else rule.description
@@ -868,11 +1614,11 @@ class WorkplaceOptimizer:
                     # (为了更严谨，这里假设如果当前中枢里有互斥组的人，那个组就算被用了)
                     used_groups.add(rule.group)
 
-        available_ops = self.get_available_operators()
-        op_by_name = {op.name: op for op in available_ops}
+        op_by_name = self.get_owned_operators()
+        blocked = self.get_blocked_mask('control_center', operator_usage, shift_used_names)
 
         # 2. 遍历规则尝试填充
-        for rule in self.cc_rules:
+        for rule in self.active_cc_rules:
             if remaining_slots <= 0:
                 break
 
@@ -885,25 +1631,12 @@ class WorkplaceOptimizer:
                 continue
 
             # --- 干员可用性检查 ---
+            # A/B/C. 是否拥有、当前班次是否已上班、累计工作班次是否已满 (不能超过2班)
+            if rule.operator_mask & blocked:
+                continue
+
             valid_rule = True
             for op_name in rule.operators:
-                # A. 检查是否拥有
-                if op_name not in op_by_name:
-                    valid_rule = False;
-                    break
-
-                # B. 检查是否当前班次已上班
-                if op_name in shift_used_names:
-                    valid_rule = False;
-                    break
-
-                # =========================================================
-                # C. [新增关键修复] 检查累计工作班次 (不能超过2班)
-                # =========================================================
-                if operator_usage.get(op_name, 0) >= 2:
-                    valid_rule = False;
-                    break
-
                 # D. 检查练度
                 op_obj = op_by_name[op_name]
                 if not ignore_elite:
@@ -920,6 +1653,7 @@ class WorkplaceOptimizer:
                 current_cc_ops.append(op_name)
                 shift_used_names.add(op_name)
                 operator_usage[op_name] = operator_usage.get(op_name, 0) + 1
+            blocked |= rule.operator_mask
 
             remaining_slots -= len(rule.operators)
 
@@ -948,25 +1682,55 @@ class WorkplaceOptimizer:
         process_req_list(result.processing_station_requirements, process_ops)  # 收集加工站
         process_req_list(result.hire_requirements, hire_ops)  # 暂时忽略办公室或加对应的集合
 
+    def resolve_fiammetta_targets(self, ignore_elite: bool = False) -> bool:
+        """按配置和练度确定菲亚梅塔充能对象（写入 self.fiammetta_targets），返回是否启用菲亚梅塔"""
+        fiammetta_config = self.config_data.get('Fiammetta', {"enable": False})
+        fiammetta_enable = fiammetta_config.get('enable', False)
+        # 在潜在模式下，我们假设菲亚梅塔是可用的（只要有）
+        fiammetta_available = self.check_fiammetta_available(ignore_elite) if fiammetta_enable else False
+        self.fiammetta_targets = self.select_fiammetta_targets() if fiammetta_available else []
+        if fiammetta_enable and not self.fiammetta_targets:
+            fiammetta_enable = False
+        return fiammetta_enable
+
     def get_optimal_assignments(self, product_requirements: Dict[str, Dict[str, int]] = None,
-                                ignore_elite: bool = False) -> Dict[str, Any]:
+                                ignore_elite: bool = False, solver: str = "greedy",
+                                time_limit: float = 0.9, node_limit: int = 200000,
+                                improve_time: float = 0.0, seed: int = 0, restarts: int = 16,
+                                incumbent: Optional['SharedIncumbent'] = None, improve_moves: Optional[int] = None,
+                                executor=None) -> Dict[str, Any]:
         """
         获取最优分配方案
         :param ignore_elite: 是否忽略精英化等级限制（潜在最高效率模式）
+        :param solver: "greedy" 逐房间贪心；"exact" 以贪心结果为初始解，对每个班次的全部房间联合做分支定界；
+                       "joint" 把三个班次和干员班次上限作为整体，在休息安排上做局部搜索；
+                       "randomized" 按 seed 随机化房间顺序和候选先后的一次贪心；
+                       "monte_carlo" 逐班贪心加 restarts 次随机重启，取全天效率最高者（并行版本见 solve_monte_carlo）；
+                       "portfolio" 在同一时间预算内运行多种策略取最优（并行版本见 solve_portfolio）
+        :param time_limit: exact / joint / monte_carlo / portfolio 模式下整次调用的搜索时间预算（秒），
+                           exact 按剩余班次平均分配，超时返回已找到的最优解
+        :param node_limit: exact 模式下每个班次的搜索节点上限
+        :param improve_time: 大于 0 时，在上述结果的基础上再做限时局部搜索（秒），见 improve_day
+        :param improve_moves: 给出时局部搜索恰好做这么多次移动，结果只由 seed 决定，improve_time 只作为安全上限
+        :param seed: randomized / monte_carlo 和局部搜索的随机种子
+        :param restarts: monte_carlo 模式下的随机重启次数
+        :param incumbent: 组合求解中共享的当前最优全天效率；exact 模式据此提高各班次需要超过的效率以加强剪枝
+        :param executor: create_solver_pool 创建的进程池；monte_carlo / portfolio 模式把重启或策略分给其子进程
         """
+        if solver not in ("greedy", "exact", "joint", "randomized", "monte_carlo", "portfolio"):
+            raise ValueError(f"未知的求解模式: {solver}")
         if product_requirements is None:
             product_requirements = self.config_data.get('product_requirements', {
                 "trading_stations": {"LMD": 3, "Orundum": 0},
                 "manufacturing_stations": {"Pure Gold": 3, "Originium Shard": 0, "Battle Record": 0}
             })
+        if solver == "monte_carlo":
+            return self._solve_monte_carlo(executor, product_requirements, ignore_elite, restarts, seed, time_limit,
+                                           improve_time, improve_moves)
+        if solver == "portfolio":
+            return self._solve_portfolio(executor, product_requirements, ignore_elite, seed, time_limit)
 
-        fiammetta_config = self.config_data.get('Fiammetta', {"enable": False})
-        fiammetta_enable = fiammetta_config.get('enable', False)
-        # 在潜在模式下，我们假设菲亚梅塔是可用的（只要有）
-        fiammetta_available = self.check_fiammetta_available(ignore_elite) if fiammetta_enable else False
-        self.fiammetta_targets = self.select_fiammetta_targets() if fiammetta_available else []
-        if fiammetta_enable and not self.fiammetta_targets:
-            fiammetta_enable = False
+        fiammetta_enable = self.resolve_fiammetta_targets(ignore_elite)
 
         # 初始化产物... (同前)
         trading_products = []
@@ -1012,98 +1776,1555 @@ class WorkplaceOptimizer:
 
         operator_usage = {op.name: 0 for op in self.get_available_operators()}
 
+        solver_stats = []
+        deadline = time.perf_counter() + time_limit
+        day_choices = [None, None, None]
+        shift_bound = self.shift_upper_bound(ignore_elite) if solver == "exact" and incumbent is not None else 0.0
+        if solver == "joint":
+            day_choices, stats = self.solve_day_joint(ignore_elite, fiammetta_enable, time_limit)
+            solver_stats.append(stats)
+        elif solver == "randomized":
+            # 随机化结果中的个别选择可能在真实流程中失效，先重放一遍得到过滤后的房间选择
+            rooms = self.build_day_rooms(ignore_elite)
+            day = self.randomized_day(rooms, random.Random(seed))
+            _, day_choices, _, _ = self._replay_day(rooms, day, ignore_elite, fiammetta_enable)
+
+        shift_efficiency = []
         for shift in range(3):
-            current_target = self.fiammetta_targets[
-                shift % len(self.fiammetta_targets)] if self.fiammetta_targets else ""
-
-            plan = {
-                "name": f"第{shift + 1}班",
-                "description": "",
-                "Fiammetta": {"enable": fiammetta_enable, "target": current_target, "order": "pre"},
-                "rooms": {
-                    "trading": [], "manufacture": [], "control": [{"operators": []}],
-                    "power": [], "meeting": [{"autofill": True}], "hire": [{"operators": []}],
-                    "dormitory": [{"autofill": True} for _ in range(4)], "processing": [{"operators": []}],
-                }
+            if solver == "exact":
+                # 贪心结果作为初始解，只有分支定界找到更优解时才替换
+                greedy_usage = dict(operator_usage)
+                plan, shift_assignments = self._plan_shift(shift, greedy_usage, ignore_elite, fiammetta_enable)
+                greedy_value = sum(r.operator_efficiency for r in shift_assignments)
+                shift_limit = max(0.0, deadline - time.perf_counter()) / (3 - shift)
+                target = greedy_value
+                if incumbent is not None:
+                    # 全天要超过其他策略的当前最优，本班次至少需要的效率（之后的班次按上界估计）
+                    target = max(target, incumbent.get() - sum(shift_efficiency) - (2 - shift) * shift_bound)
+                room_choices, stats = self.solve_shift_exact(operator_usage, ignore_elite, target,
+                                                             shift_limit, node_limit)
+                if room_choices is not None:
+                    plan, shift_assignments = self._plan_shift(shift, operator_usage, ignore_elite,
+                                                               fiammetta_enable, room_choices)
+                else:
+                    operator_usage = greedy_usage
+                solver_stats.append(stats)
+            else:
+                plan, shift_assignments = self._plan_shift(shift, operator_usage, ignore_elite, fiammetta_enable,
+                                                           day_choices[shift])
+
+            results["plans"].append(plan)
+            results["raw_results"].extend(shift_assignments)
+            shift_efficiency.append(sum(r.operator_efficiency for r in shift_assignments))
+
+        # 各班次干员效率之和，以及全天合计
+        results["shift_efficiency"] = shift_efficiency
+        results["daily_efficiency"] = sum(shift_efficiency)
+
+        if improve_time > 0:
+            solver_stats.append(self._improve_results(results, ignore_elite, fiammetta_enable, improve_time, seed,
+                                                      improve_moves))
+        if solver_stats:
+            results["solver_stats"] = solver_stats
+        return results
+
+    def _improve_results(self, results: Dict[str, Any], ignore_elite: bool, fiammetta_enable: bool,
+                         improve_time: float, seed: int, improve_moves: Optional[int] = None) -> Dict[str, Any]:
+        """
+        对已完成的结果做限时局部搜索，找到更优方案时就地替换排班和效率（充能对象有变化时记录在
+        results["fiammetta_targets"]，见 calculate_upgrade_requirements），返回统计信息
+        """
+        improved, stats = self.improve_day(results, ignore_elite, fiammetta_enable, improve_time, seed, improve_moves)
+        if improved is not None:
+            plans, day_assignments = improved
+            results["plans"] = plans
+            if stats['fiammetta_targets'] != list(self.fiammetta_targets):
+                results["fiammetta_targets"] = stats['fiammetta_targets']
+            results["raw_results"] = [r for assignments in day_assignments for r in assignments]
+            results["shift_efficiency"] = [sum(r.operator_efficiency for r in assignments)
+                                           for assignments in day_assignments]
+            results["daily_efficiency"] = sum(results["shift_efficiency"])
+        return stats
+
+    def _plan_shift(self, shift: int, operator_usage: Dict[str, int], ignore_elite: bool, fiammetta_enable: bool,
+                    room_choices: Optional[Dict[str, List['RoomCandidate']]] = None
+                    ) -> Tuple[Dict[str, Any], List[AssignmentResult]]:
+        """
+        生成单个班次的排班，并就地更新 operator_usage。
+        :param room_choices: 房间 id -> 已确定的规则应用列表（精确求解结果）；为 None 时逐房间贪心
+        """
+        def solve_room(workplace: Workplace) -> AssignmentResult:
+            if room_choices is None:
+                return self.optimize_workplace(workplace, operator_usage, shift_used_names, ignore_elite)
+            return self._apply_room_choices(workplace, room_choices.get(workplace.id, []),
+                                            operator_usage, shift_used_names)
+
+        current_target = self.fiammetta_targets[
+            shift % len(self.fiammetta_targets)] if self.fiammetta_targets else ""
+
+        plan = {
+            "name": f"第{shift + 1}班",
+            "description": "",
+            "Fiammetta": {"enable": fiammetta_enable, "target": current_target, "order": "pre"},
+            "rooms": {
+                "trading": [], "manufacture": [], "control": [{"operators": []}],
+                "power": [], "meeting": [{"autofill": True}], "hire": [{"operators": []}],
+                "dormitory": [{"autofill": True} for _ in range(4)], "processing": [{"operators": []}],
             }
+        }
 
-            shift_used_names = set()
-            control_operators = set()
-            dormitory_operators = set()
-            hire_operators = set()
-            processing_operators = set()
-
-            shift_assignments = []
-
-            # 1. 优化制造站
-            for workplace in self.workplaces['manufacturing_stations']:
-                result = self.optimize_workplace(workplace, operator_usage, shift_used_names, ignore_elite)
-                shift_assignments.append(result)
-                plan["rooms"]["manufacture"].append({
-                    "operators": [op.name for op in result.optimal_operators],
-                    "autofill": False if result.optimal_operators else True,
-                    "product": workplace.current_product
-                })
-                self._collect_requirements(result, shift_used_names, operator_usage,
-                                           control_operators, dormitory_operators, hire_operators, processing_operators)
-
-            # 2. 优化贸易站
-            for workplace in self.workplaces['trading_stations']:
-                result = self.optimize_workplace(workplace, operator_usage, shift_used_names, ignore_elite)
-                shift_assignments.append(result)
-                plan["rooms"]["trading"].append({
-                    "operators": [op.name for op in result.optimal_operators],
-                    "autofill": False if result.optimal_operators else True,
-                    "product": workplace.current_product
-                })
-                self._collect_requirements(result, shift_used_names, operator_usage,
-                                           control_operators, dormitory_operators, hire_operators, processing_operators)
+        shift_used_names = set()
+        control_operators = set()
+        dormitory_operators = set()
+        hire_operators = set()
+        processing_operators = set()
 
-            # 3. 填充基础附属房间
-            plan["rooms"]["control"][0]["operators"] = list(control_operators)
+        shift_assignments = []
 
-            if dormitory_operators:
-                plan["rooms"]["dormitory"][0] = {"operators": list(dormitory_operators), "autofill": True}
+        # 1. 优化制造站
+        for workplace in self.workplaces['manufacturing_stations']:
+            result = solve_room(workplace)
+            shift_assignments.append(result)
+            plan["rooms"]["manufacture"].append({
+                "operators": [op.name for op in result.optimal_operators],
+                "autofill": False if result.optimal_operators else True,
+                "product": workplace.current_product
+            })
+            self._collect_requirements(result, shift_used_names, operator_usage,
+                                       control_operators, dormitory_operators, hire_operators, processing_operators)
 
-            # 4. 优化会客室
-            result = self.optimize_workplace(self.workplaces['meeting_room'][0], operator_usage, shift_used_names,
-                                             ignore_elite)
+        # 2. 优化贸易站
+        for workplace in self.workplaces['trading_stations']:
+            result = solve_room(workplace)
             shift_assignments.append(result)
-            plan["rooms"]["meeting"][0] = {
+            plan["rooms"]["trading"].append({
+                "operators": [op.name for op in result.optimal_operators],
+                "autofill": False if result.optimal_operators else True,
+                "product": workplace.current_product
+            })
+            self._collect_requirements(result, shift_used_names, operator_usage,
+                                       control_operators, dormitory_operators, hire_operators, processing_operators)
+
+        # 3. 填充基础附属房间
+        plan["rooms"]["control"][0]["operators"] = list(control_operators)
+
+        if dormitory_operators:
+            plan["rooms"]["dormitory"][0] = {"operators": list(dormitory_operators), "autofill": True}
+
+        # 4. 优化会客室
+        result = solve_room(self.workplaces['meeting_room'][0])
+        shift_assignments.append(result)
+        plan["rooms"]["meeting"][0] = {
+            "operators": [op.name for op in result.optimal_operators],
+            "autofill": False if result.optimal_operators else True
+        }
+
+        # 5. 优化发电站
+        for workplace in self.workplaces['power_station']:
+            result = solve_room(workplace)
+            shift_assignments.append(result)
+            plan["rooms"]["power"].append({
                 "operators": [op.name for op in result.optimal_operators],
                 "autofill": False if result.optimal_operators else True
-            }
+            })
 
-            # 5. 优化发电站
-            for workplace in self.workplaces['power_station']:
-                result = self.optimize_workplace(workplace, operator_usage, shift_used_names, ignore_elite)
-                shift_assignments.append(result)
-                plan["rooms"]["power"].append({
-                    "operators": [op.name for op in result.optimal_operators],
-                    "autofill": False if result.optimal_operators else True
-                })
+        # 6. 填充加工站
+        if processing_operators:
+            valid_process_ops = list(processing_operators)
+            plan["rooms"]["processing"][0] = {"operators": [valid_process_ops[0]], "autofill": False}
+
+        # 7. 填充控制中枢
+        self.fill_control_center(
+            plan,
+            shift_used_names,
+            operator_usage,
+            ignore_elite
+        )
 
-            # 6. 填充加工站
-            if processing_operators:
-                valid_process_ops = list(processing_operators)
-                plan["rooms"]["processing"][0] = {"operators": [valid_process_ops[0]], "autofill": False}
-
-            # 7. 填充控制中枢
-            self.fill_control_center(
-                plan,
-                shift_used_names,
-                operator_usage,
-                ignore_elite
-            )
+        # 计算无人机
+        plan["drones"] = self._assign_drones(plan, shift)
 
-            # 计算无人机
-            plan["drones"] = self._assign_drones(plan, shift)
+        return plan, shift_assignments
 
-            results["plans"].append(plan)
-            results["raw_results"].extend(shift_assignments)
+    # --------------- 精确求解：单班次分支定界 ---------------
+
+    def build_shift_rooms(self) -> List[Tuple[Workplace, bool]]:
+        """按贪心的处理顺序列出班次内的计算房间，以及房间结束后是否收集附属房间需求（仅制造站/贸易站）"""
+        rooms = [(w, True) for w in self.workplaces['manufacturing_stations']]
+        rooms += [(w, True) for w in self.workplaces['trading_stations']]
+        rooms += [(w, False) for w in self.workplaces['meeting_room'][:1]]
+        rooms += [(w, False) for w in self.workplaces['power_station']]
+        return rooms
+
+    def build_room_candidates(self, workplace: Workplace, operator_usage: Dict[str, int],
+                              ignore_elite: bool = False) -> List[RoomCandidate]:
+        """
+        按班次开始时的状态列出房间内所有可能生效的规则应用，检查与 optimize_workplace_recursive 一致。
+        只保留正收益的候选；非 plain 候选在前、plain 候选在后，两段内各自按每个位置的效率降序排列（同效率保持规则顺序）。
+        """
+        workplace_type = self.get_workplace_type(workplace)
+        op_by_name = self.get_owned_operators()
+        blocked = self.get_blocked_mask(workplace_type, operator_usage)
+        one_mask = self.operators_to_mask(n for n, c in operator_usage.items() if c == 1)
+
+        candidates = []
+        for rule in self.get_rules(workplace_type, workplace.current_product):
+            checked_reqs = (rule.requires_control_center + rule.requires_dormitory +
+                            rule.requires_power_station + rule.requires_hire)
+            if not self.check_room_requirements(checked_reqs, operator_usage, ignore_elite):
+                continue
+            requirement_mask = self.operators_to_mask(r.operator for r in checked_reqs)
+            usage_sensitive_mask = requirement_mask & one_mask
+            collect_mask = self.operators_to_mask(
+                r.operator for r in rule.requires_control_center + rule.requires_dormitory + rule.requires_hire)
+            gate = 1 if rule.is_automation else 2 if rule.is_generic else 0
+
+            groups = [[n] for n in rule.operators] if rule.apply_each else [rule.operators]
+            for ops in groups:
+                mask = self.operators_to_mask(ops)
+                if not ops or mask & blocked:
+                    continue
+                op_objs = [op_by_name[n] for n in ops]
+                elite_reqs = {ops[0]: rule.elite_requirements.get(ops[0], 0)} if rule.apply_each \
+                    else rule.elite_requirements
+                if not self.check_elite_requirements(op_objs, elite_reqs, ignore_elite):
+                    continue
+                efficiency = self.calculate_dynamic_efficiency(rule, op_objs, workplace_type)
+                if efficiency <= 0:
+                    continue
+                candidates.append(RoomCandidate(
+                    rule=rule, ops=list(ops), mask=mask, efficiency=efficiency, slots=len(ops),
+                    kind='each' if rule.apply_each else 'norm', gate=gate,
+                    usage_sensitive_mask=usage_sensitive_mask, collect_mask=collect_mask,
+                    requirement_mask=requirement_mask
+                ))
+
+        candidates.sort(key=lambda c: (c.plain, -c.density))
+        return candidates
+
+    def solve_shift_exact(self, operator_usage: Dict[str, int], ignore_elite: bool = False,
+                          incumbent: float = 0.0, time_limit: float = 0.8, node_limit: int = 200000
+                          ) -> Tuple[Optional[Dict[str, List[RoomCandidate]]], Dict[str, Any]]:
+        """
+        对一个班次的全部计算房间联合做分支定界，目标为各房间干员效率之和。
+        - 房间按贪心顺序依次填充，房间内按候选下标递增选择以消除排列重复；
+        - 相邻的同类房间（同类型同产物）若都只含 plain 候选，要求首个候选下标不减，消除房间之间的对称解；
+        - 上界：同组房间合并，每个干员至多计入一次其所在候选的单位效率，取组内剩余位置数的最大值之和，
+          同类型不同产物的组再合并计算一次取较小值；
+        - 子树结果按 (房间, 剩余位置, 门禁, 起始候选, 已用干员, 待收集干员, 对称约束) 记忆化。
+        :param incumbent: 初始解（贪心）的效率，只有严格更优的解才会返回
+        :return: (房间 id -> 规则应用列表，未找到更优解时为 None, 统计信息)
+        """
+        started = time.perf_counter()
+        deadline = started + time_limit
+        rooms = self.build_shift_rooms()
+        n = len(rooms)
+        room_cands = [self.build_room_candidates(w, operator_usage, ignore_elite) for w, _ in rooms]
+        room_slots = [w.max_operators for w, _ in rooms] + [0]
+        collects = [c for _, c in rooms]
+        collectable = self.operators_to_mask(name for name, c in operator_usage.items() if c < 2)
+        plain_start = [next((idx for idx, c in enumerate(cands) if c.plain), len(cands)) for cands in room_cands]
+
+        # 上界分组：同类型同产物的房间候选完全相同；同类型不同产物的组共享干员，再按类型合并一次取较小值
+        group_keys = [(self.get_workplace_type(w), w.current_product) for w, _ in rooms]
+        group_ids = {key: gid for gid, key in enumerate(dict.fromkeys(group_keys))}
+        room_group = [group_ids[key] for key in group_keys] + [-1]
+        group_entries = [[] for _ in group_ids]
+        for i, cands in enumerate(room_cands):
+            entries = group_entries[room_group[i]]
+            if entries:
+                continue
+            for c in cands:
+                for name in c.ops:
+                    entries.append((c.density, 1 << self.operator_ids[name], c.mask | c.usage_sensitive_mask))
+            entries.sort(key=lambda e: e[0], reverse=True)
+        type_groups: Dict[str, List[int]] = {}
+        for (workplace_type, _), gid in group_ids.items():
+            type_groups.setdefault(workplace_type, []).append(gid)
+        type_units = []  # (类型内各组, 合并后的候选条目所在的虚拟组号)
+        for gids in type_groups.values():
+            if len(gids) > 1:
+                group_entries.append(sorted((e for gid in gids for e in group_entries[gid]),
+                                            key=lambda e: e[0], reverse=True))
+                type_units.append((gids, len(group_entries) - 1))
+            else:
+                type_units.append((gids, None))
+        # rest_slots[i][g]: 房间 i 之后各组的位置总数
+        rest_slots = [[0] * len(group_ids) for _ in range(n + 1)]
+        for i in range(n - 1, -1, -1):
+            rest_slots[i] = list(rest_slots[i + 1])
+            if i + 1 < n:
+                rest_slots[i][room_group[i + 1]] += room_slots[i + 1]
+
+        # 只有与组内候选相关的已用干员会影响该组上界，以此作为缓存键
+        group_relevant = [0] * len(group_entries)
+        for gid, entries in enumerate(group_entries):
+            for _, _, mask in entries:
+                group_relevant[gid] |= mask
+        topk_cache: Dict[Tuple[int, int, int], float] = {}
+
+        def topk(gid: int, k: int, used: int) -> float:
+            if k <= 0:
+                return 0.0
+            used &= group_relevant[gid]
+            key = (gid, k, used)
+            value = topk_cache.get(key)
+            if value is None:
+                value, seen, count = 0.0, 0, 0
+                for density, bit, mask in group_entries[gid]:
+                    if mask & used or bit & seen:
+                        continue
+                    seen |= bit
+                    value += density
+                    count += 1
+                    if count >= k:
+                        break
+                if len(topk_cache) > 200000:
+                    topk_cache.clear()
+                topk_cache[key] = value
+            return value
+
+        def bound(i: int, slots: int, used: int) -> Tuple[float, float]:
+            """返回 (含当前房间剩余位置的上界, 只含之后房间的上界)"""
+            current_gid = room_group[i]
+            with_current, rest = 0.0, 0.0
+            for gids, merged in type_units:
+                if current_gid in gids:
+                    parts = []
+                    for extra in (slots, 0):
+                        value = sum(topk(gid, rest_slots[i][gid] + (extra if gid == current_gid else 0), used)
+                                    for gid in gids)
+                        if merged is not None and value > 0:
+                            value = min(value, topk(merged, sum(rest_slots[i][gid] for gid in gids) + extra, used))
+                        parts.append(value)
+                    with_current += parts[0]
+                    rest += parts[1]
+                else:
+                    value = sum(topk(gid, rest_slots[i][gid], used) for gid in gids)
+                    if merged is not None and value > 0:
+                        value = min(value, topk(merged, sum(rest_slots[i][gid] for gid in gids), used))
+                    with_current += value
+                    rest += value
+            return with_current, rest
+
+        no_floor = -1
+        empty_floor = 1 << 30  # 前一个同类 plain 房间为空：本房间不能以 plain 候选开头
+
+        def next_room(i: int, used: int, pending: int, first: int) -> Tuple[int, int]:
+            """结束房间 i：收集附属房间需求，并给出下一个房间的对称约束"""
+            if collects[i]:
+                used |= pending & collectable
+            floor = no_floor
+            if room_group[i + 1] == room_group[i] and (first < 0 or first >= plain_start[i]):
+                floor = first if first >= 0 else empty_floor
+            return used, floor
+
+        eps = 1e-9
+        inf = float('inf')
+        memo: Dict[Tuple, Tuple[float, Any, bool]] = {}
+        stats = {'nodes': 0, 'memo_hits': 0, 'aborted': False, 'greedy_value': incumbent}
+        best = {'value': incumbent, 'path': None}
+
+        def record(value: float, path, suffix):
+            if value > best['value'] + eps:
+                choices = []
+                while path is not None:
+                    choices.append(path[0])
+                    path = path[1]
+                choices.reverse()
+                while suffix is not None:
+                    choices.append(suffix[0])
+                    suffix = suffix[1]
+                best['value'], best['path'] = value, choices
+
+        def search(i: int, slots: int, gate: int, start: int, used: int, pending: int, first: int, floor: int,
+                   acc: float, path):
+            """返回 (剩余房间的效率, 对应选择链, 是否精确)；不精确时第一个值是上界"""
+            if i == n:
+                record(acc, path, None)
+                return 0.0, None, True
+            alpha = best['value'] - acc
+            # first 只在下一个房间同组时影响后续，其余情况归一化以提高记忆化命中
+            key_first = first if room_group[i + 1] == room_group[i] else no_floor
+            key = (i, slots, gate, start, used, pending, key_first, floor)
+            entry = memo.get(key)
+            if entry is not None and (entry[2] or entry[0] <= alpha + eps):
+                stats['memo_hits'] += 1
+                if entry[2]:
+                    record(acc + entry[0], path, entry[1])
+                return entry
+
+            stats['nodes'] += 1
+            if stats['nodes'] >= node_limit or (not stats['nodes'] & 1023 and time.perf_counter() > deadline):
+                stats['aborted'] = True
+            if stats['aborted']:
+                return inf, None, False
+
+            ub, rest_ub = bound(i, slots, used)
+            if ub <= alpha + eps:
+                memo[key] = (ub, None, False)
+                return memo[key]
+
+            best_real, best_suffix, ub_max = -inf, None, -inf
+            cands = room_cands[i]
+            # 两段候选各自按单位效率降序：某个候选的上界不足时，本段之后的候选都可以跳过
+            for seg_start, seg_end in ((start, plain_start[i]), (max(start, plain_start[i]), len(cands))):
+                for idx in range(seg_start, seg_end):
+                    c = cands[idx]
+                    limit = slots * c.density + rest_ub
+                    if limit <= max(alpha, best['value'] - acc) + eps:
+                        ub_max = max(ub_max, limit)
+                        break
+                    if (c.slots > slots or c.mask & used or c.usage_sensitive_mask & used or
+                            (c.gate and gate and c.gate != gate)):
+                        continue
+                    if first < 0 and floor != no_floor and idx >= plain_start[i] and idx < floor:
+                        continue
+                    choice = (i, idx)
+                    room_first = idx if first < 0 else first
+                    if c.slots == slots:
+                        next_used, next_floor = next_room(i, used | c.mask, pending | c.collect_mask, room_first)
+                        v, suffix, exact = search(i + 1, room_slots[i + 1], 0, 0, next_used, 0, no_floor,
+                                                  next_floor, acc + c.efficiency, (choice, path))
+                    else:
+                        v, suffix, exact = search(i, slots - c.slots, gate | c.gate, idx + 1, used | c.mask,
+                                                  pending | c.collect_mask, room_first, no_floor,
+                                                  acc + c.efficiency, (choice, path))
+                    if exact:
+                        if c.efficiency + v > best_real:
+                            best_real, best_suffix = c.efficiency + v, (choice, suffix)
+                    else:
+                        ub_max = max(ub_max, c.efficiency + v)
+
+            # 结束当前房间（剩余位置留空）
+            next_used, next_floor = next_room(i, used, pending, first)
+            v, suffix, exact = search(i + 1, room_slots[i + 1], 0, 0, next_used, 0, no_floor, next_floor, acc, path)
+            if exact:
+                if v > best_real:
+                    best_real, best_suffix = v, suffix
+            else:
+                ub_max = max(ub_max, v)
+
+            if stats['aborted']:
+                return inf, None, False
+            if best_real > alpha + eps and best_real + eps >= ub_max:
+                result = (best_real, best_suffix, True)
+            else:
+                result = (max(best_real, ub_max), None, False)
+            memo[key] = result
+            return result
+
+        if n:
+            search(0, room_slots[0], 0, 0, 0, 0, no_floor, no_floor, 0.0, None)
+
+        stats['best_value'] = best['value']
+        stats['improved'] = best['path'] is not None
+        stats['elapsed'] = time.perf_counter() - started
+        if best['path'] is None:
+            return None, stats
+
+        room_choices: Dict[str, List[RoomCandidate]] = {}
+        for i, idx in best['path']:
+            room_choices.setdefault(rooms[i][0].id, []).append(room_cands[i][idx])
+        return room_choices, stats
+
+    def _apply_room_choices(self, workplace: Workplace, choices: List[RoomCandidate],
+                            operator_usage: Dict[str, int], shift_used_names: set) -> AssignmentResult:
+        """按确定的规则应用填充房间，状态更新与结果记录方式与 optimize_workplace_recursive 相同"""
+        op_by_name = self.get_owned_operators()
+        assigned_ops: List[Operator] = []
+        total_synergy = 0.0
+        applied_combinations: List[str] = []
+        applied_rules: List[OperatorEfficiency] = []
+        assignment_detail: List[Dict] = []
+        applied_reqs = {'control': [], 'dorm': [], 'power': [], 'hire': []}
+
+        for cand in choices:
+            rule = cand.rule
+            for n in cand.ops:
+                assigned_ops.append(op_by_name[n])
+                shift_used_names.add(n)
+                operator_usage[n] += 1
+            total_synergy += cand.efficiency
+            applied_rules.append(rule)
+            desc = f"{rule.description}({', '.join(cand.ops)})" if cand.kind == 'each' else rule.description
+            applied_combinations.append(desc)
+            applied_reqs['control'].extend(rule.requires_control_center)
+            applied_reqs['dorm'].extend(rule.requires_dormitory)
+            applied_reqs['power'].extend(rule.requires_power_station)
+            applied_reqs['hire'].extend(rule.requires_hire)
+            assignment_detail.append({'rule': rule, 'ops': cand.ops, 'eff': cand.efficiency, 'type': cand.kind})
+
+        return AssignmentResult(
+            workplace=workplace,
+            optimal_operators=assigned_ops,
+            total_efficiency=workplace.base_efficiency + total_synergy,
+            operator_efficiency=total_synergy,
+            applied_combinations=applied_combinations,
+            applied_rules=applied_rules,
+            control_center_requirements=applied_reqs['control'],
+            dormitory_requirements=applied_reqs['dorm'],
+            power_station_requirements=applied_reqs['power'],
+            hire_requirements=applied_reqs['hire'],
+            processing_station_requirements=[],
+            assignment_detail=assignment_detail
+        )
+
+    # --------------- 联合求解：三班次整体排班 ---------------
+
+    @staticmethod
+    def fill_room(cands: List[RoomCandidate], kept: List[RoomCandidate], req_blocked: int, once: int,
+                  slots: int, blocked: int, used: int, gate: int = 0, pending: int = 0, value: float = 0.0
+                  ) -> Tuple[int, int, int, int, int, float]:
+        """
+        班次模型中按顺序把候选放入一个房间，直到位置用完；联合求解、局部搜索和真实流程重放共用这里的接受规则，
+        位置数、门禁、疲劳和附属需求的检查与 optimize_workplace_recursive / check_room_requirements 一致。
+        放入的候选追加到 kept。
+        :param req_blocked: 附属需求不能涉及的干员（休息或已上满两班）
+        :param once: 本班开始时已上过 1 班的干员，附属需求涉及他们时他们不能在本班已上班
+        :param blocked: 本房间不能使用的干员；used 为本班已上班的干员（跨房间累计）
+        :return: 放入后的 (slots, blocked, used, gate, pending, value)，可以原样传回以继续填充同一房间；
+                 pending 为房间结束后会被收集的附属需求干员
+        """
+        for c in cands:
+            if slots <= 0:
+                break
+            if (c.slots > slots or c.mask & blocked or c.requirement_mask & req_blocked or
+                    c.requirement_mask & once & used or (c.gate and gate and c.gate != gate)):
+                continue
+            kept.append(c)
+            blocked |= c.mask
+            used |= c.mask
+            slots -= c.slots
+            gate |= c.gate
+            pending |= c.collect_mask
+            value += c.efficiency
+        return slots, blocked, used, gate, pending, value
+
+    def build_day_rooms(self, ignore_elite: bool = False
+                        ) -> List[Tuple[Workplace, bool, bool, List[RoomCandidate]]]:
+        """班次内各计算房间的 (房间, 是否收集附属需求, 是否贸易站, 按单位效率降序的候选)，候选按未上班状态生成"""
+        zero_usage = {op.name: 0 for op in self.get_available_operators()}
+        rooms = []
+        for workplace, collects in self.build_shift_rooms():
+            cands = sorted(self.build_room_candidates(workplace, zero_usage, ignore_elite), key=lambda c: -c.density)
+            rooms.append((workplace, collects, self.get_workplace_type(workplace) == 'trading_station', cands))
+        return rooms
+
+    def shift_upper_bound(self, ignore_elite: bool = False) -> float:
+        """单个班次干员效率的上界：各计算房间的位置数乘以其候选的最高单位效率"""
+        return sum(workplace.max_operators * max((c.density for c in cands), default=0.0)
+                   for workplace, _, _, cands in self.build_day_rooms(ignore_elite))
+
+    def _replay_day(self, rooms: List[Tuple[Workplace, bool, bool, List[RoomCandidate]]],
+                    day: Optional[List[List[List[RoomCandidate]]]], ignore_elite: bool, fiammetta_enable: bool):
+        """
+        按真实流程重放三个班次；day 为 None 时为逐班贪心。
+        :return: (全天效率, 各班次的房间选择, 各班次排班, 各班次的房间结果)
+        """
+        usage = {op.name: 0 for op in self.get_available_operators()}
+        total, day_choices, plans, day_assignments = 0.0, [], [], []
+        for shift in range(3):
+            room_choices = None
+            if day is not None:
+                # 控制中枢的补位不在搜索模型内，可能让个别候选在重放时失效，这里剔除
+                fatigued = self.operators_to_mask(n for n, c in usage.items() if c >= 2)
+                one_mask = self.operators_to_mask(n for n, c in usage.items() if c == 1)
+                used, room_choices = 0, {}
+                for (workplace, collects, _, _), picked in zip(rooms, day[shift]):
+                    kept = []
+                    _, _, used, _, pending, _ = self.fill_room(
+                        picked, kept, fatigued, one_mask, workplace.max_operators,
+                        self.get_blocked_mask(self.get_workplace_type(workplace), usage) | used, used)
+                    if collects:
+                        used |= pending & ~fatigued
+                    room_choices[workplace.id] = kept
+                day_choices.append(room_choices)
+            plan, assignments = self._plan_shift(shift, usage, ignore_elite, fiammetta_enable, room_choices)
+            total += sum(r.operator_efficiency for r in assignments)
+            plans.append(plan)
+            day_assignments.append(assignments)
+        return total, day_choices, plans, day_assignments
+
+    def solve_day_joint(self, ignore_elite: bool = False, fiammetta_enable: bool = False, time_limit: float = 0.9
+                        ) -> Tuple[List[Optional[Dict[str, List[RoomCandidate]]]], Dict[str, Any]]:
+        """
+        把三个班次和每个干员的班次上限作为一个整体求解，避免第一班用光最优干员、第三班只剩残余。
+        - 决策变量是每个干员被指定休息的班次（可以不指定）；给定休息安排后三个班次依次用候选贪心排班，
+          累计班次用三个位掩码计数，疲劳规则与 get_blocked_mask / check_room_requirements 一致；
+        - 在休息安排上做局部搜索，一次移动一个候选涉及的全部干员，避免拆散组合；
+        - 各房间候选只在开始时生成一次，单个班次的结果按 (休息掩码, 疲劳状态) 缓存，
+          只改动后面班次的休息安排时前面班次直接复用；
+        - 最优安排按真实流程重放，与逐班贪心比较全天总效率，取较优者。
+        :return: (三个班次各自的房间选择，不优于逐班贪心时全为 None, 统计信息)
+        """
+        started = time.perf_counter()
+        deadline = started + time_limit
+        eps = 1e-9
+        targets = self.operators_to_mask(self.fiammetta_targets)
+
+        rooms = self.build_day_rooms(ignore_elite)
+        units: Dict[int, float] = {}  # 候选涉及的干员集合 -> 最高单位效率
+        for _, _, _, cands in rooms:
+            for c in cands:
+                units[c.mask] = max(units.get(c.mask, 0.0), c.density)
+
+        shift_cache: Dict[Tuple[int, int, int, int], Tuple[float, int, List[List[RoomCandidate]]]] = {}
+        stats = {'evaluations': 0, 'cache_hits': 0, 'moves': 0, 'aborted': False}
+
+        def plan_shift(rest: int, c1: int, c2: int, c3: int) -> Tuple[float, int, List[List[RoomCandidate]]]:
+            """c1/c2/c3 为累计已上 1/2/3 班的干员；返回 (效率, 本班上班干员, 各房间的选择)"""
+            key = (rest, c1, c2, c3)
+            entry = shift_cache.get(key)
+            if entry is not None:
+                stats['cache_hits'] += 1
+                return entry
+            stats['evaluations'] += 1
+            used, value, day_rooms = 0, 0.0, []
+            for workplace, collects, is_trading, cands in rooms:
+                picked = []
+                _, _, used, _, pending, room_value = self.fill_room(
+                    cands, picked, rest | c2, c1, workplace.max_operators,
+                    rest | used | ((c2 & ~targets) | c3 if is_trading else c2), used)
+                if collects:
+                    used |= pending & ~c2
+                value += room_value
+                day_rooms.append(picked)
+            if len(shift_cache) > 50000:
+                shift_cache.clear()
+            shift_cache[key] = (value, used, day_rooms)
+            return shift_cache[key]
+
+        def evaluate(rests: List[int]) -> Tuple[float, List[List[List[RoomCandidate]]]]:
+            c1 = c2 = c3 = 0
+            total, day = 0.0, []
+            for rest in rests:
+                value, used, day_rooms = plan_shift(rest, c1, c2, c3)
+                total += value
+                day.append(day_rooms)
+                c3 |= c2 & used
+                c2 |= c1 & used
+                c1 |= used
+            return total, day
+
+        # 局部搜索：按单位效率从高到低尝试把每组干员改到某个班次休息（或取消休息），接受严格改进
+        rests = [0, 0, 0]
+        best_value, best_day = evaluate(rests)
+        ordered_units = sorted(units, key=lambda m: -units[m])
+        improved = True
+        while improved and not stats['aborted']:
+            improved = False
+            for unit in ordered_units:
+                for target in (None, 0, 1, 2):
+                    trial = [r & ~unit for r in rests]
+                    if target is not None:
+                        trial[target] |= unit
+                    if trial == rests:
+                        continue
+                    if time.perf_counter() > deadline:
+                        stats['aborted'] = True
+                        break
+                    value, day = evaluate(trial)
+                    if value > best_value + eps:
+                        rests, best_value, best_day = trial, value, day
+                        stats['moves'] += 1
+                        improved = True
+                if stats['aborted']:
+                    break
 
+        greedy_total = self._replay_day(rooms, None, ignore_elite, fiammetta_enable)[0]
+        joint_total, day_choices, _, _ = self._replay_day(rooms, best_day, ignore_elite, fiammetta_enable)
+        stats['greedy_value'] = greedy_total
+        stats['best_value'] = max(greedy_total, joint_total)
+        stats['improved'] = joint_total > greedy_total + eps
+        stats['elapsed'] = time.perf_counter() - started
+        if not stats['improved']:
+            return [None, None, None], stats
+        return day_choices, stats
+
+    # --------------- 进程池分发 ---------------
+
+    @staticmethod
+    def pool_parts(executor) -> int:
+        """本进程加上进程池子进程的份数；没有进程池时为 1"""
+        return 1 + (getattr(executor, 'max_workers', 1) if executor is not None else 0)
+
+    @classmethod
+    def round_robin(cls, items: List[Any], executor) -> List[List[Any]]:
+        """按下标轮流把 items 分成 pool_parts(executor) 份"""
+        parts = cls.pool_parts(executor)
+        return [items[i::parts] for i in range(parts)]
+
+    def _fan_out(self, executor, shares: List[List[Any]], local, task, *task_args) -> List[Any]:
+        """
+        shares[0] 在本进程中用 local(share) 计算，其余非空的份同时交给进程池，
+        在子进程中调用 task(operator_data, config_data, share, *task_args)；按 shares 的顺序返回各份结果，空份为 None。
+        """
+        futures = [executor.submit(task, self.operator_data, self.config_data, share, *task_args) if share else None
+                   for share in shares[1:]]
+        results = [local(shares[0]) if shares[0] else None]
+        results += [future.result() if future is not None else None for future in futures]
         return results
 
+    # --------------- 随机重启：多次随机化贪心取最优 ---------------
+
+    @staticmethod
+    def restart_seeds(restarts: int, seed: int = 0) -> List[Optional[int]]:
+        """随机重启使用的种子序列：首项 None 表示确定性的逐班贪心，其余由 seed 确定"""
+        rng = random.Random(seed)
+        return [None] + [rng.getrandbits(32) for _ in range(max(restarts, 0))]
+
+    def run_restarts(self, seeds: List[Optional[int]], deadline: float, ignore_elite: bool = False,
+                     product_requirements: Dict[str, Dict[str, int]] = None,
+                     incumbent: Optional['SharedIncumbent'] = None
+                     ) -> Tuple[int, Dict[str, Any], List[str], List[Dict[str, Any]]]:
+        """
+        依次运行 seeds 中的各次重启（None 为逐班贪心，其余为 randomized 模式），至少运行一次。
+        :param deadline: time.time() 的截止时刻，跨进程共用
+        :param incumbent: 给出时每次重启的结果都提交为共享的当前最优
+        :return: (最优结果在 seeds 中的下标, 最优结果, 其菲亚梅塔充能对象, 各次重启的统计)
+        """
+        best_index, best, best_targets, restart_stats = -1, None, [], []
+        for index, restart_seed in enumerate(seeds):
+            if best is not None and time.time() >= deadline:
+                break
+            started = time.perf_counter()
+            if restart_seed is None:
+                result = self.get_optimal_assignments(product_requirements, ignore_elite)
+            else:
+                result = self.get_optimal_assignments(product_requirements, ignore_elite, solver="randomized",
+                                                      seed=restart_seed)
+            restart_stats.append({'seed': restart_seed, 'daily_efficiency': result['daily_efficiency'],
+                                  'elapsed': time.perf_counter() - started, 'pid': os.getpid()})
+            if best is None or result['daily_efficiency'] > best['daily_efficiency'] + 1e-9:
+                best_index, best, best_targets = index, result, list(self.fiammetta_targets)
+                if incumbent is not None:
+                    incumbent.offer(result['daily_efficiency'])
+        return best_index, best, best_targets, restart_stats
+
+    def solve_monte_carlo(self, operator_data: Optional[JsonSource] = None, config_data: Optional[JsonSource] = None,
+                          ignore_elite: bool = False, restarts: int = 16, seed: int = 0, time_limit: float = 2.0,
+                          improve_time: float = 0.0, executor=None, cache: Optional['ResultCache'] = None,
+                          improve_moves: Optional[int] = None) -> Dict[str, Any]:
+        """
+        随机重启搜索：逐班贪心加 restarts 次随机化贪心，分散到 executor 的各个子进程和本进程中同时运行，取全天效率最高者。
+        - 种子序列由 seed 确定，各次重启的结果与进程分配无关；效率相同时取序列中靠前的一次，
+          结果只由 restarts 和 seed 决定（局部搜索给出 improve_moves 时同样只由移动次数决定）；
+        - time_limit（秒）只是安全上限：超过后不再开始新的重启，solver_stats 中记录 deadline_hit；
+        - solver_stats 中记录每次重启的种子、全天效率和耗时，以及逐班贪心与最优结果的差距。
+        :param executor: create_solver_pool 创建的进程池；为 None 时全部在本进程中运行
+        """
+        worker = self.fork(operator_data, config_data)
+        options = dict(ignore_elite=ignore_elite, restarts=restarts, seed=seed, time_limit=time_limit,
+                       improve_time=improve_time, improve_moves=improve_moves)
+        if cache is not None:
+            key = worker.result_key('monte_carlo', **options)
+            result = cache.get(key)
+            if result is None:
+                result = worker._solve_monte_carlo(executor, None, ignore_elite, restarts, seed, time_limit,
+                                                   improve_time, improve_moves)
+                cache.put(key, result)
+            return result
+        return worker._solve_monte_carlo(executor, None, ignore_elite, restarts, seed, time_limit, improve_time,
+                                         improve_moves)
+
+    def _solve_monte_carlo(self, executor, product_requirements: Optional[Dict[str, Dict[str, int]]],
+                           ignore_elite: bool, restarts: int, seed: int, time_limit: float,
+                           improve_time: float, improve_moves: Optional[int] = None) -> Dict[str, Any]:
+        """随机重启的实际计算；种子按下标轮流分给本进程和各子进程"""
+        started = time.perf_counter()
+        deadline = time.time() + time_limit
+        seeds = self.restart_seeds(restarts, seed)
+        chunks = self.round_robin(list(range(len(seeds))), executor)
+        outcomes = self._fan_out(
+            executor, [[seeds[p] for p in chunk] for chunk in chunks],
+            lambda share: self.run_restarts(share, deadline, ignore_elite, product_requirements),
+            _restarts_in_pool, deadline, ignore_elite, product_requirements)
+
+        best_position, best, best_targets = len(seeds), None, []
+        restart_stats = []
+        for chunk, outcome in zip(chunks, outcomes):
+            if outcome is None:
+                continue
+            index, result, targets, chunk_stats = outcome
+            restart_stats.extend(chunk_stats)
+            if result is None:
+                continue
+            position = chunk[index]
+            value = result['daily_efficiency']
+            if best is None or value > best['daily_efficiency'] + 1e-9 or (
+                    value > best['daily_efficiency'] - 1e-9 and position < best_position):
+                best_position, best, best_targets = position, result, targets
+        order = {s: i for i, s in enumerate(seeds)}
+        restart_stats.sort(key=lambda entry: order[entry['seed']])
+
+        self.fiammetta_targets = best_targets
+        greedy_value = restart_stats[0]['daily_efficiency']
+        stats = {'restarts': restart_stats, 'completed': len(restart_stats), 'greedy_value': greedy_value,
+                 'best_value': best['daily_efficiency'], 'best_seed': seeds[best_position],
+                 'gap': best['daily_efficiency'] - greedy_value, 'deadline_hit': len(restart_stats) < len(seeds),
+                 'elapsed': time.perf_counter() - started}
+        best['solver_stats'] = [stats]
+        if improve_time > 0:
+            fiammetta_enable = best['plans'][0]['Fiammetta']['enable']
+            best['solver_stats'].append(self._improve_results(best, ignore_elite, fiammetta_enable,
+                                                              improve_time, seed, improve_moves))
+        return best
+
+    # --------------- 组合求解：多种策略共用时间预算 ---------------
+
+    PORTFOLIO_STRATEGIES = ("greedy", "monte_carlo", "local", "exact", "joint")
+
+    def run_strategy(self, strategy: str, deadline: float, ignore_elite: bool = False,
+                     product_requirements: Dict[str, Dict[str, int]] = None, seed: int = 0,
+                     incumbent: Optional['SharedIncumbent'] = None
+                     ) -> Tuple[Dict[str, Any], List[str], Dict[str, Any]]:
+        """
+        在 deadline（time.time() 的截止时刻）之前运行组合求解中的一种策略，并把结果提交为共享的当前最优。
+        - greedy：逐班贪心；monte_carlo：随机重启直到截止；local：贪心加局部搜索；
+          exact：分支定界，按共享的当前最优剪枝；joint：三班次联合求解。
+        :return: (结果, 其菲亚梅塔充能对象, 统计信息)
+        """
+        started = time.perf_counter()
+        budget = max(0.0, deadline - time.time())
+        if strategy == "greedy":
+            result = self.get_optimal_assignments(product_requirements, ignore_elite)
+        elif strategy == "monte_carlo":
+            # 逐班贪心由 greedy 策略负责，这里只跑随机重启
+            seeds = self.restart_seeds(1024, seed)[1:]
+            _, result, targets, restart_stats = self.run_restarts(seeds, deadline, ignore_elite,
+                                                                  product_requirements, incumbent)
+            self.fiammetta_targets = targets
+            result['solver_stats'] = [{'restarts': restart_stats, 'completed': len(restart_stats)}]
+        elif strategy == "local":
+            result = self.get_optimal_assignments(product_requirements, ignore_elite, improve_time=budget, seed=seed)
+        elif strategy == "exact":
+            result = self.get_optimal_assignments(product_requirements, ignore_elite, solver="exact",
+                                                  time_limit=budget, incumbent=incumbent)
+        elif strategy == "joint":
+            result = self.get_optimal_assignments(product_requirements, ignore_elite, solver="joint",
+                                                  time_limit=budget)
+        else:
+            raise ValueError(f"未知的组合求解策略: {strategy}")
+        if incumbent is not None:
+            incumbent.offer(result['daily_efficiency'])
+        stats = {'strategy': strategy, 'daily_efficiency': result['daily_efficiency'],
+                 'elapsed': time.perf_counter() - started, 'pid': os.getpid()}
+        return result, list(self.fiammetta_targets), stats
+
+    def solve_portfolio(self, operator_data: Optional[JsonSource] = None, config_data: Optional[JsonSource] = None,
+                        ignore_elite: bool = False, time_limit: float = 2.0, seed: int = 0,
+                        executor=None, cache: Optional['ResultCache'] = None) -> Dict[str, Any]:
+        """
+        组合求解：PORTFOLIO_STRATEGIES 中的各策略共用一个截止时刻，取全天效率最高的结果。
+        - executor 为 create_solver_pool 创建的进程池、且子进程数不少于其余策略数时，逐班贪心在本进程运行，
+          其余策略在子进程中同时运行，各策略通过进程池的共享数组交换当前最优效率（exact 据此剪枝）；
+        - 否则（没有进程池、子进程不足或共享槽位用完）在本进程中依次运行，每个策略平分剩余时间；
+        - 效率相同时取 PORTFOLIO_STRATEGIES 中靠前的策略；solver_stats 记录胜出的策略和各策略的效率与耗时。
+        """
+        worker = self.fork(operator_data, config_data)
+        if cache is not None:
+            key = worker.result_key('portfolio', ignore_elite=ignore_elite, time_limit=time_limit, seed=seed)
+            result = cache.get(key)
+            if result is None:
+                result = worker._solve_portfolio(executor, None, ignore_elite, seed, time_limit)
+                cache.put(key, result)
+            return result
+        return worker._solve_portfolio(executor, None, ignore_elite, seed, time_limit)
+
+    def _solve_portfolio(self, executor, product_requirements: Optional[Dict[str, Dict[str, int]]],
+                         ignore_elite: bool, seed: int, time_limit: float) -> Dict[str, Any]:
+        """组合求解的实际计算"""
+        started = time.perf_counter()
+        deadline = time.time() + time_limit
+        strategies = self.PORTFOLIO_STRATEGIES
+        # 策略共用同一个截止时刻，只有每个策略都能分到一个子进程时才真正同时运行；
+        # 子进程不足时排队的策略开始时已没有剩余时间，不如在本进程中依次运行、平分时间
+        slot = executor.acquire_slot() if (isinstance(executor, SolverPool) and
+                                           executor.max_workers >= len(strategies) - 1) else None
+        try:
+            if slot is not None:
+                incumbent = SharedIncumbent(executor.incumbents, slot)
+                futures = {strategy: executor.submit(_strategy_in_pool, self.operator_data, self.config_data,
+                                                     strategy, deadline, ignore_elite, product_requirements,
+                                                     seed, slot)
+                           for strategy in strategies[1:]}
+                local = strategies[:1]
+            else:
+                incumbent = SharedIncumbent()
+                futures = {}
+                local = strategies
+            outcomes = {}
+            for k, strategy in enumerate(local):
+                # 本进程依次运行时，每个策略平分剩余时间
+                share = time.time() + max(0.0, deadline - time.time()) / (len(local) - k)
+                outcomes[strategy] = self.run_strategy(strategy, share, ignore_elite, product_requirements,
+                                                       seed, incumbent)
+            for strategy, future in futures.items():
+                outcomes[strategy] = future.result()
+        finally:
+            if slot is not None:
+                executor.release_slot(slot)
+
+        best, best_targets, best_strategy = None, [], None
+        for strategy in strategies:
+            result, targets, _ = outcomes[strategy]
+            if best is None or result['daily_efficiency'] > best['daily_efficiency'] + 1e-9:
+                best, best_targets, best_strategy = result, targets, strategy
+        self.fiammetta_targets = best_targets
+        best['solver_stats'] = [{
+            'best_strategy': best_strategy, 'best_value': best['daily_efficiency'],
+            'strategies': [outcomes[strategy][2] for strategy in strategies],
+            'shared_incumbent': slot is not None, 'elapsed': time.perf_counter() - started,
+        }] + best.get('solver_stats', [])
+        return best
+
+    # --------------- 布局与产物分配扫描 ---------------
+
+    TRADING_PRODUCTS = ("LMD", "Orundum")
+    MANUFACTURING_PRODUCTS = ("Pure Gold", "Originium Shard", "Battle Record")
+    # 左侧 9 个位置中发电站固定为规则文件中的 3 间（buildingType 同样按 3 间计算），贸易站和制造站共 6 间
+    PRODUCTION_ROOMS = 6
+
+    @staticmethod
+    def product_splits(count: int, products: Tuple[str, ...]) -> List[Dict[str, int]]:
+        """把 count 个房间分配给各产物的全部方式（每种产物 0 个或以上）"""
+        if len(products) == 1:
+            return [{products[0]: count}]
+        return [{products[0]: k, **rest} for k in range(count, -1, -1)
+                for rest in WorkplaceOptimizer.product_splits(count - k, products[1:])]
+
+    @classmethod
+    def layout_configs(cls, base_config: Optional[Dict[str, Any]] = None,
+                       trading_counts: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """
+        列出扫描的全部配置：贸易站 + 制造站共 PRODUCTION_ROOMS 间（发电站固定 3 间），以及两类房间的每一种产物分配。
+        其余配置项（如菲亚梅塔）沿用 base_config。
+        :param trading_counts: 只扫描这些贸易站数量，默认 0..PRODUCTION_ROOMS
+        """
+        production_rooms = cls.PRODUCTION_ROOMS
+        base_config = dict(base_config or {})
+        configs = []
+        for trading in (trading_counts if trading_counts is not None else range(production_rooms + 1)):
+            manufacturing = production_rooms - trading
+            if trading < 0 or manufacturing < 0:
+                continue
+            for trading_split in cls.product_splits(trading, cls.TRADING_PRODUCTS):
+                for manufacturing_split in cls.product_splits(manufacturing, cls.MANUFACTURING_PRODUCTS):
+                    configs.append({
+                        **base_config,
+                        "trading_stations_count": trading,
+                        "manufacturing_stations_count": manufacturing,
+                        "product_requirements": {"trading_stations": trading_split,
+                                                 "manufacturing_stations": manufacturing_split},
+                    })
+        return configs
+
+    def evaluate_configs(self, configs: List[Dict[str, Any]], ignore_elite: bool = False,
+                         **solver_options) -> List[Dict[str, Any]]:
+        """
+        在本优化器上依次求解各个配置，返回每个配置的效率汇总（不含排班详情）。
+        配置按原顺序通过 configure 切换，贸易站数量相同的配置之间复用房间置换表。
+        """
+        rows = []
+        for config in configs:
+            self.configure(config)
+            result = self.get_optimal_assignments(ignore_elite=ignore_elite, **solver_options)
+            requirements = config["product_requirements"]
+            trading, manufacturing = config["trading_stations_count"], config["manufacturing_stations_count"]
+            rows.append({
+                "layout": f"{trading}-{manufacturing}-{len(self.workplaces['power_station'])}",
+                "trading_stations_count": trading,
+                "manufacturing_stations_count": manufacturing,
+                "trading": requirements["trading_stations"],
+                "manufacturing": requirements["manufacturing_stations"],
+                "daily_efficiency": result["daily_efficiency"],
+                "shift_efficiency": result["shift_efficiency"],
+                "config": config,
+            })
+        return rows
+
+    def sweep_layouts(self, operator_data: Optional[JsonSource] = None, base_config: Optional[JsonSource] = None,
+                      ignore_elite: bool = False, trading_counts: Optional[List[int]] = None, executor=None,
+                      **solver_options) -> List[Dict[str, Any]]:
+        """
+        扫描布局（贸易站/制造站数量）和每一种产物分配，按全天干员效率从高到低排名。
+        - 配置按贸易站数量分组：组内规则相同，在同一个优化器上依次求解以复用房间结果
+          （例如同样的制造站在不同贸易站产物分配下）；
+        - executor 为 create_solver_pool 创建的进程池时，各组按配置数量均衡分给本进程和各子进程同时计算；
+        - 返回的每一行含 rank、layout、两类房间的产物分配、全天与各班次效率，以及可直接使用的 config。
+        :param solver_options: 传给 get_optimal_assignments 的求解参数
+        """
+        worker = self.fork(operator_data, base_config)
+        configs = self.layout_configs(worker.config_data, trading_counts)
+        groups: Dict[int, List[Dict[str, Any]]] = {}
+        for config in configs:
+            groups.setdefault(config["trading_stations_count"], []).append(config)
+
+        # 最长处理时间优先：配置多的组先分配给当前负载最小的一份
+        shares: List[List[Dict[str, Any]]] = [[] for _ in range(self.pool_parts(executor))]
+        for group in sorted(groups.values(), key=len, reverse=True):
+            min(shares, key=len).extend(group)
+        rows = [row for part in worker._fan_out(
+                    executor, shares, lambda share: worker.evaluate_configs(share, ignore_elite, **solver_options),
+                    _sweep_in_pool, ignore_elite, solver_options) if part for row in part]
+
+        rows.sort(key=lambda row: (-row["daily_efficiency"], row["trading_stations_count"],
+                                   [-v for v in row["trading"].values()], [-v for v in row["manufacturing"].values()]))
+        for rank, row in enumerate(rows, 1):
+            row["rank"] = rank
+        return rows
+
+    # --------------- 练度提升的逐项评估 ---------------
+
+    def upgrade_candidates(self) -> List[Tuple[str, int]]:
+        """
+        列出可能带来收益的单项精英化提升 (干员, 目标等级)：已持有的干员，目标为规则（成员、附属需求、中枢规则）
+        中对其要求的、高于当前等级的每个等级。
+        """
+        required: Dict[str, set] = {}
+        for rule in self.efficiency_rules:
+            for name, elite in rule.elite_requirements.items():
+                required.setdefault(name, set()).add(elite)
+            for r in (rule.requires_control_center + rule.requires_dormitory + rule.requires_power_station +
+                      rule.requires_hire + rule.requires_processing_station):
+                required.setdefault(r.operator, set()).add(r.elite_required)
+        for rule in self.cc_rules:
+            for name, elite in rule.elite_requirements.items():
+                required.setdefault(name, set()).add(elite)
+        owned = self.get_owned_operators()
+        return [(name, elite) for name in sorted(required) if name in owned
+                for elite in sorted(required[name]) if elite > owned[name].elite]
+
+    def upgrade_bundles(self) -> List[Tuple[Tuple[str, int], ...]]:
+        """
+        按规则打包需要同时提升的干员（同 calculate_upgrade_requirements 的打包方式）：组合规则的全部成员、
+        apply_each 规则的每个成员各自，连同规则的附属房间需求，以及中枢组合规则的成员。
+        只保留其中全部干员都已持有、且至少两人需要提升的组合，每项为按干员名排序的 ((干员, 目标等级), ...)。
+        """
+        owned = self.get_owned_operators()
+        groups: List[Dict[str, int]] = []
+        for rule in self.efficiency_rules:
+            requirements: Dict[str, int] = {}
+            for r in (rule.requires_control_center + rule.requires_dormitory + rule.requires_power_station +
+                      rule.requires_hire + rule.requires_processing_station):
+                requirements[r.operator] = max(requirements.get(r.operator, 0), r.elite_required)
+            members = [[op] for op in rule.operators] if rule.apply_each else [rule.operators]
+            for ops in members:
+                needed = dict(requirements)
+                for op in ops:
+                    needed[op] = max(needed.get(op, 0), rule.elite_requirements.get(op, 0))
+                groups.append(needed)
+        for rule in self.cc_rules:
+            groups.append({op: rule.elite_requirements.get(op, 0) for op in rule.operators})
+
+        bundles = set()
+        for needed in groups:
+            if any(name not in owned for name in needed):
+                continue
+            bundle = tuple(sorted((name, elite) for name, elite in needed.items() if elite > owned[name].elite))
+            if len(bundle) >= 2:
+                bundles.add(bundle)
+        return sorted(bundles)
+
+    @staticmethod
+    def upgrade_items(candidate) -> Tuple[Tuple[str, int], ...]:
+        """把候选（(干员, 目标等级) 或其组合）统一为按干员名排序的 ((干员, 目标等级), ...)；也接受评估结果条目"""
+        if isinstance(candidate, dict):
+            if candidate['type'] == 'bundle':
+                return tuple((op['name'], op['target']) for op in candidate['ops'])
+            return ((candidate['name'], candidate['target']),)
+        if isinstance(candidate[0], str):
+            return (tuple(candidate),)
+        return tuple(sorted(tuple(item) for item in candidate))
+
+    def _what_if(self, overrides: Dict[str, Dict[str, Any]], base: Dict[str, Any], solver_options: Dict[str, Any]
+                 ) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        按 干员名 -> 字段 修改干员数据，增量重新求解后恢复原数据。
+        :return: (修改后的求解结果, 与 base 相比干员效率有变化的房间)
+        """
+        # 同名干员的全部条目（如阿米娅的不同形态）一起修改，与 load_operators 的结果保持一致
+        originals = [entry for entry in self.operator_data if entry['name'] in overrides]
+        result = self.replan([dict(entry, **overrides[entry['name']]) for entry in originals], **solver_options)
+        self.apply_roster_diff(originals)
+        rooms = list(dict.fromkeys(
+            r.workplace.name for r, b in zip(result['raw_results'], base['raw_results'])
+            if abs(r.operator_efficiency - b.operator_efficiency) > 1e-9))
+        return result, rooms
+
+    def score_upgrade(self, candidate, base: Dict[str, Any], **solver_options) -> Optional[Dict[str, Any]]:
+        """
+        把一项候选（单人或组合）应用到干员数据上，增量重新求解当前练度方案并与 base 比较，随后恢复原数据。
+        会临时修改本实例；base 必须是本实例在当前干员数据下的求解结果。候选涉及未知干员时返回 None。
+        """
+        items = self.upgrade_items(candidate)
+        if any(name not in self.operators for name, _ in items):
+            return None
+        ops = [{'name': name, 'current': self.operators[name].elite, 'target': target} for name, target in items]
+        result, rooms = self._what_if({name: {'elite': target} for name, target in items}, base, solver_options)
+        evaluation = {'type': 'single', **ops[0]} if len(ops) == 1 else {'type': 'bundle', 'ops': ops}
+        evaluation.update({
+            'gain': result['daily_efficiency'] - base['daily_efficiency'],
+            'daily_efficiency': result['daily_efficiency'], 'rooms': ", ".join(rooms),
+        })
+        return evaluation
+
+    def evaluate_upgrades(self, candidates: Optional[List[Any]] = None, base: Optional[Dict[str, Any]] = None,
+                          **solver_options) -> List[Dict[str, Any]]:
+        """
+        逐项评估精英化提升的真实收益：每个候选单独应用到干员数据上，用增量求解（replan）重新排当前练度方案，
+        与基准方案比较全天干员效率，随后恢复原数据。会临时修改本实例，请在 fork 出的优化器上调用。
+        :param candidates: (干员, 目标等级) 或其组合的列表，默认为 upgrade_candidates()
+        :param base: 本实例在当前干员数据下的求解结果，已有时传入可省去一次求解
+        :return: 每个候选一项，单人为 {"type": "single", "name", "current", "target", ...}，
+                 组合为 {"type": "bundle", "ops": [{"name", "current", "target"}, ...], ...}，
+                 另含 gain（全天干员效率的变化）、daily_efficiency 和 rooms（效率有变化的房间）；按收益从高到低排列
+        """
+        if candidates is None:
+            candidates = self.upgrade_candidates()
+        if base is None:
+            base = self.get_optimal_assignments(**solver_options)
+        evaluations = [e for e in (self.score_upgrade(c, base, **solver_options) for c in candidates) if e is not None]
+        evaluations.sort(key=lambda item: (-item['gain'], self.upgrade_items(item)))
+        return evaluations
+
+    def _evaluate_upgrades(self, executor, candidates: List[Any], solver_options: Dict[str, Any],
+                           base: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """evaluate_upgrades 的并行版本：候选按下标轮流分给本进程和进程池的各子进程，结果与单进程相同"""
+        evaluations = [e for part in self._fan_out(
+                           executor, self.round_robin(candidates, executor),
+                           lambda share: self.evaluate_upgrades(share, base, **solver_options),
+                           _what_if_in_pool, solver_options) if part for e in part]
+        evaluations.sort(key=lambda item: (-item['gain'], self.upgrade_items(item)))
+        return evaluations
+
+    def what_if_upgrades(self, operator_data: Optional[JsonSource] = None, config_data: Optional[JsonSource] = None,
+                         candidates: Optional[List[Any]] = None, executor=None,
+                         **solver_options) -> List[Dict[str, Any]]:
+        """
+        无副作用的逐项提升评估入口（见 evaluate_upgrades）。
+        executor 为 create_solver_pool 创建的进程池时，候选按下标轮流分给本进程和各子进程同时评估，结果与单进程相同。
+        """
+        worker = self.fork(operator_data, config_data)
+        if candidates is None:
+            candidates = worker.upgrade_candidates()
+        return worker._evaluate_upgrades(executor, candidates, solver_options)
+
+    def upgrade_reach(self) -> Dict[str, Tuple[set, set]]:
+        """
+        干员 -> (可能影响的 (房间类型, 产物), 同规则的干员)：按其作为成员或附属需求出现的全部规则统计，
+        产物为 None 表示该类型的全部产物，同规则的干员包括其他成员和附属需求干员。
+        """
+        reach: Dict[str, Tuple[set, set]] = {}
+        for rule in self.efficiency_rules:
+            rooms = {(rule.workplace_type, product) for product in rule.products} or {(rule.workplace_type, None)}
+            names = rule.operators + [r.operator for r in (
+                rule.requires_control_center + rule.requires_dormitory + rule.requires_power_station +
+                rule.requires_hire + rule.requires_processing_station)]
+            for name in names:
+                keys, partners = reach.setdefault(name, (set(), set()))
+                keys.update(rooms)
+                partners.update(names)
+        return reach
+
+    def plan_changes(self, before: Dict[str, Any], after: Dict[str, Any]) -> Tuple[set, set, set]:
+        """两个方案之间的变化：(干员或效率有变化的房间名, 这些房间的 (类型, 产物), 位置有变化的干员)"""
+        names, keys = set(), set()
+        for b, a in zip(before['raw_results'], after['raw_results']):
+            if abs(a.operator_efficiency - b.operator_efficiency) > 1e-9 or \
+                    [op.name for op in a.optimal_operators] != [op.name for op in b.optimal_operators]:
+                names.add(a.workplace.name)
+                keys.add((self.get_workplace_type(a.workplace), a.workplace.current_product))
+        positions_before, positions_after = self.assigned_operators(before), self.assigned_operators(after)
+        moved = {name for name in set(positions_before) | set(positions_after)
+                 if positions_before.get(name) != positions_after.get(name)}
+        return names, keys, moved
+
+    def plan_upgrade_path(self, operator_data: Optional[JsonSource] = None, config_data: Optional[JsonSource] = None,
+                          max_steps: int = 20, include_bundles: bool = True, min_gain: float = 0.01,
+                          executor=None, **solver_options) -> Dict[str, Any]:
+        """
+        规划多步提升路线：每一步在已应用的提升之上，选出边际收益最高的单人提升或组合（收益相同时人数少者优先），
+        应用后继续，直到达到 max_steps 或没有收益超过 min_gain 的候选。
+        - 候选为 upgrade_candidates() 的单人提升，以及（include_bundles 时）upgrade_bundles() 的组合；
+          已应用的部分从组合中去掉，剩余部分相同的候选合并；
+        - 每一步以上一步应用后的方案为基准，用 score_upgrade 增量评估（可交给进程池），基准方案不再重复求解；
+        - 上一步使干员或效率有变化的房间之外，候选的收益沿用之前的评估：候选干员（成员或附属需求）
+          能影响到的房间（见 upgrade_reach）和它上次评估时有变化的房间都不在其中时，才视为不受影响。
+          组合规则使得收益在其他提升之后可能变大，受影响的候选因此全部重新评估，而不是只复查排在前面的；
+        - 选中的候选若沿用的是之前的评估，先重新评估再比较，应用的每一步收益都是在当前方案上实测的。
+        :return: {"steps": [...], "base_efficiency", "final_efficiency", "total_gain", "stats"}，
+                 steps 中每项同 evaluate_upgrades 的条目，另含 step（从 1 开始）和 cumulative_gain；
+                 stats 中 evaluations 为实际评估的次数，reused 为沿用之前评估的次数
+        """
+        started = time.perf_counter()
+        worker = self.fork(operator_data, config_data)
+        base = worker.get_optimal_assignments(**solver_options)
+        base_efficiency = base['daily_efficiency']
+        candidates = [(item,) for item in worker.upgrade_candidates()]
+        if include_bundles:
+            candidates += worker.upgrade_bundles()
+        stats = {'candidates': len(candidates), 'evaluations': 0, 'reused': 0}
+        reach = worker.upgrade_reach()
+        scored: Dict[Tuple[Tuple[str, int], ...], Dict[str, Any]] = {}
+
+        def order(e):
+            return -e['gain'], len(worker.upgrade_items(e)), worker.upgrade_items(e)
+
+        def affected(items, changed) -> bool:
+            names, keys, moved = changed
+            if set(scored[items]['rooms'].split(", ")) & names:
+                return True
+            for name, _ in items:
+                rooms, partners = reach.get(name, (set(), set()))
+                if partners & moved or any(key in rooms or (key[0], None) in rooms for key in keys):
+                    return True
+            return False
+
+        steps, changed = [], None
+        for step in range(max_steps):
+            # 去掉已应用的部分，剩余部分相同的候选合并
+            candidates = list(dict.fromkeys(
+                rest for rest in (tuple((name, elite) for name, elite in items if worker.operators[name].elite < elite)
+                                  for items in candidates) if rest))
+            stale = [items for items in candidates if items not in scored or changed is None or affected(items, changed)]
+            fresh = set(stale)
+            for e in worker._evaluate_upgrades(executor, stale, solver_options, base):
+                scored[worker.upgrade_items(e)] = e
+            stats['evaluations'] += len(stale)
+            stats['reused'] += len(candidates) - len(stale)
+
+            chosen = None
+            while True:
+                chosen = min((scored[items] for items in candidates if items in scored), key=order, default=None)
+                if chosen is None or worker.upgrade_items(chosen) in fresh:
+                    break
+                items = worker.upgrade_items(chosen)
+                fresh.add(items)
+                stats['evaluations'] += 1
+                stats['reused'] -= 1
+                evaluation = worker.score_upgrade(items, base, **solver_options)
+                if evaluation is None:
+                    del scored[items]
+                else:
+                    scored[items] = evaluation
+            if chosen is None or chosen['gain'] <= min_gain:
+                break
+
+            items = worker.upgrade_items(chosen)
+            targets = dict(items)
+            previous = base
+            base = worker.replan([dict(entry, elite=targets[entry['name']]) for entry in worker.operator_data
+                                  if entry['name'] in targets], **solver_options)
+            changed = worker.plan_changes(previous, base)
+            steps.append(dict(chosen, step=step + 1, cumulative_gain=base['daily_efficiency'] - base_efficiency))
+
+        stats['elapsed'] = time.perf_counter() - started
+        return {
+            'steps': steps,
+            'base_efficiency': base_efficiency,
+            'final_efficiency': base['daily_efficiency'],
+            'total_gain': base['daily_efficiency'] - base_efficiency,
+            'stats': stats,
+        }
+
+    # --------------- 干员贡献：逐个移除后重新排班 ---------------
+
+    @staticmethod
+    def assigned_operators(assignments: Dict[str, Any]) -> Dict[str, List[str]]:
+        """排班中出现的干员 -> 所在位置（房间名，或中枢、宿舍等 MAA 房间类型，以及菲亚梅塔的充能目标），按出现顺序"""
+        positions: Dict[str, List[str]] = {}
+        room_names = {}
+        for result in assignments['raw_results']:
+            for op in result.optimal_operators:
+                room_names.setdefault(op.name, []).append(result.workplace.name)
+        for plan in assignments['plans']:
+            for room_type, rooms in plan['rooms'].items():
+                for room in rooms:
+                    for name in room.get('operators', []):
+                        positions.setdefault(name, []).extend(room_names.get(name) or [room_type])
+            fiammetta = plan.get('Fiammetta', {})
+            if fiammetta.get('enable') and fiammetta.get('target'):
+                positions.setdefault('菲亚梅塔', []).append('菲亚梅塔')
+                positions.setdefault(fiammetta['target'], []).append('菲亚梅塔充能')
+        return {name: list(dict.fromkeys(places)) for name, places in positions.items()}
+
+    def evaluate_removals(self, names: Optional[List[str]] = None, base: Optional[Dict[str, Any]] = None,
+                          **solver_options) -> List[Dict[str, Any]]:
+        """
+        逐个评估干员的实际贡献：把干员标记为未持有，用增量求解（replan）重新排班，全天干员效率的下降即为其贡献，
+        随后恢复原数据。会临时修改本实例，请在 fork 出的优化器上调用。
+        贪心并非全局最优，移除某个干员后偶尔反而排出更好的方案；这种情况下 loss 记为 0（该干员可替代），
+        多出的效率记录在 better_without 中，提示原方案本身还有改进空间。
+        :param names: 要评估的干员，默认为当前方案中出现的全部干员（见 assigned_operators）
+        :param base: 本实例在当前干员数据下的求解结果，已有时传入可省去一次求解
+        :return: 每个干员一项 {"name", "loss", "better_without", "daily_efficiency", "positions", "rooms"}，
+                 loss 为移除后全天效率的下降（不小于 0），positions 为原方案中的位置，rooms 为移除后效率有变化的房间；
+                 按 loss 从高到低排列，loss 为 0 的干员可以被其他干员替代
+        """
+        if base is None:
+            base = self.get_optimal_assignments(**solver_options)
+        positions = self.assigned_operators(base)
+        if names is None:
+            names = list(positions)
+        evaluations = []
+        for name in names:
+            if name not in self.operators:
+                continue
+            result, rooms = self._what_if({name: {'own': False}}, base, solver_options)
+            drop = base['daily_efficiency'] - result['daily_efficiency']
+            evaluations.append({
+                'name': name, 'loss': max(drop, 0.0), 'better_without': max(-drop, 0.0),
+                'daily_efficiency': result['daily_efficiency'],
+                'positions': ", ".join(positions.get(name, [])), 'rooms': ", ".join(rooms),
+            })
+        evaluations.sort(key=lambda item: (-item['loss'], item['name']))
+        return evaluations
+
+    def operator_contributions(self, operator_data: Optional[JsonSource] = None,
+                               config_data: Optional[JsonSource] = None, names: Optional[List[str]] = None,
+                               executor=None, **solver_options) -> List[Dict[str, Any]]:
+        """
+        无副作用的干员贡献分析入口（见 evaluate_removals）。
+        executor 为 create_solver_pool 创建的进程池时，干员按下标轮流分给本进程和各子进程同时评估，结果与单进程相同。
+        """
+        worker = self.fork(operator_data, config_data)
+        base = worker.get_optimal_assignments(**solver_options)
+        if names is None:
+            names = list(worker.assigned_operators(base))
+        evaluations = [e for part in worker._fan_out(
+                           executor, self.round_robin(names, executor),
+                           lambda share: worker.evaluate_removals(share, base, **solver_options),
+                           _removals_in_pool, solver_options) if part for e in part]
+        evaluations.sort(key=lambda item: (-item['loss'], item['name']))
+        return evaluations
+
+    # --------------- 局部搜索：在已有方案上继续改进 ---------------
+
+    def _settle_shift(self, rooms: List[Tuple[Workplace, bool, bool, List[RoomCandidate]]],
+                      picks: List[Tuple[RoomCandidate, ...]], c1: int, c2: int, c3: int, targets: int, dirty,
+                      room_order: Optional[List[int]] = None, room_cands: Optional[List[List[RoomCandidate]]] = None
+                      ) -> Tuple[float, int, List[Tuple[RoomCandidate, ...]]]:
+        """
+        按联合求解的班次模型结算一个班次：保留仍然有效的选择，dirty 中的房间（及失去选择的房间）再用候选贪心补满。
+        c1/c2/c3 为班次开始时累计已上 1/2/3 班的干员，targets 为菲亚梅塔充能对象。
+        :param room_order: 房间的结算顺序，默认按 rooms 的顺序
+        :param room_cands: 补位时各房间的候选顺序，默认按单位效率降序
+        :return: (效率, 本班上班干员, 结算后各房间的选择，按 rooms 的顺序)
+        """
+        used, value = 0, 0.0
+        settled: List[Tuple[RoomCandidate, ...]] = [()] * len(rooms)
+        for r in (room_order if room_order is not None else range(len(rooms))):
+            workplace, collects, is_trading, cands = rooms[r]
+            if room_cands is not None:
+                cands = room_cands[r]
+            kept = []
+            state = self.fill_room(picks[r], kept, c2, c1, workplace.max_operators,
+                                   used | ((c2 & ~targets) | c3 if is_trading else c2), used)
+            if state[0] > 0 and (r in dirty or len(kept) < len(picks[r])):
+                state = self.fill_room(cands, kept, c2, c1, *state)
+            _, _, used, _, pending, room_value = state
+            if collects:
+                used |= pending & ~c2
+            value += room_value
+            settled[r] = tuple(kept)
+        return value, used, settled
+
+    def randomized_day(self, rooms: List[Tuple[Workplace, bool, bool, List[RoomCandidate]]], rng: random.Random,
+                       jitter: float = 0.05) -> List[List[Tuple[RoomCandidate, ...]]]:
+        """
+        随机化的三班次候选贪心：每个班次随机打乱房间的填充顺序，候选按单位效率乘以 (1 + jitter * U(0,1)) 排序，
+        相同或接近的候选随机决出先后。返回各班次各房间的选择，需经 _replay_day 按真实流程重放。
+        """
+        n = len(rooms)
+        targets = self.operators_to_mask(self.fiammetta_targets)
+        c1 = c2 = c3 = 0
+        day = []
+        for _ in range(3):
+            order = list(range(n))
+            rng.shuffle(order)
+            room_cands = [sorted(cands, key=lambda c: -c.density * (1.0 + jitter * rng.random()))
+                          for _, _, _, cands in rooms]
+            _, used, picks = self._settle_shift(rooms, [()] * n, c1, c2, c3, targets, range(n), order, room_cands)
+            day.append(picks)
+            c1, c2, c3 = c1 | used, c2 | (c1 & used), c3 | (c2 & used)
+        return day
+
+
+    def improve_day(self, results: Dict[str, Any], ignore_elite: bool = False, fiammetta_enable: bool = False,
+                    time_limit: float = 0.5, seed: int = 0, max_moves: Optional[int] = None
+                    ) -> Tuple[Optional[Tuple[List[Dict[str, Any]], List[List[AssignmentResult]]]], Dict[str, Any]]:
+        """
+        以 get_optimal_assignments 得到的方案为起点做模拟退火，在时间预算内随时保留最优方案。
+        - 方案表示为每个班次每个房间的规则应用（RoomCandidate）列表，加上菲亚梅塔的充能对象；
+        - 移动：把某个规则应用放进房间（挤掉同班次内冲突的选择，可同时从另一个班次撤下相关干员）、
+          交换同一房间在两个班次的内容、撤下一个规则应用、替换一个菲亚梅塔充能对象；
+        - 评估与联合求解的班次模型一致：只从被改动的最早班次开始重新结算，仍然有效的选择直接保留，
+          被改动或失去选择的房间再用候选贪心补满，之前班次的结果和疲劳计数直接复用；
+        - 最优方案按真实流程重放，只有严格优于原方案的全天效率时才采用；
+        - 不修改 self.fiammetta_targets，采用方案的充能对象记录在统计信息的 fiammetta_targets 中。
+        :param results: get_optimal_assignments 的结果（需含 raw_results 和 daily_efficiency），
+                        统计信息中的 start_value 即其全天效率
+        :param seed: 随机种子，相同种子和相同的移动次数得到相同的结果
+        :param max_moves: 给出时恰好做这么多次移动（温度按移动次数下降），结果只由 seed 决定；
+                          time_limit 只作为安全上限，提前截止时统计信息中 deadline_hit 为 True
+        :return: ((各班次排班, 各班次的房间结果)，未找到更优方案时为 None, 统计信息)
+        """
+        started = time.perf_counter()
+        deadline = started + time_limit
+        eps = 1e-9
+        rng = random.Random(seed)
+        base_value = results.get('daily_efficiency', 0.0)
+        stats = {'moves': 0, 'accepted': 0, 'best_moves': 0, 'start_value': base_value,
+                 'best_value': base_value, 'improved': False, 'deadline_hit': False}
+
+        rooms = self.build_day_rooms(ignore_elite)
+        n = len(rooms)
+        raw_results = results.get('raw_results', [])
+        if not n or len(raw_results) != 3 * n or any(
+                raw_results[s * n + r].workplace.id != rooms[r][0].id for s in range(3) for r in range(n)):
+            stats['elapsed'] = time.perf_counter() - started
+            return None, stats
+
+        # 原方案中的规则应用映射回候选；映射不到的（例如体系规则整体）所在房间在首次结算时用候选贪心补满
+        lookup: Dict[Tuple[int, int, Tuple[str, ...]], RoomCandidate] = {}
+        for r, (_, _, _, cands) in enumerate(rooms):
+            for c in cands:
+                lookup.setdefault((r, c.rule.rule_id, tuple(c.ops)), c)
+        day: List[List[Tuple[RoomCandidate, ...]]] = []
+        unmapped = []
+        for s in range(3):
+            shift_picks = []
+            for r in range(n):
+                details = raw_results[s * n + r].assignment_detail
+                picks = tuple(lookup[key] for key in ((r, d['rule'].rule_id, tuple(d['ops'])) for d in details)
+                              if key in lookup)
+                if len(picks) < len(details):
+                    unmapped.append((s, r))
+                shift_picks.append(picks)
+            day.append(shift_picks)
+
+        original_targets = list(self.fiammetta_targets)
+        target_pool = []
+        if fiammetta_enable and original_targets:
+            owned = self.get_owned_operators()
+            target_pool = sorted({op for rule in self.efficiency_rules if rule.workplace_type == 'trading_station'
+                                  for op in rule.operators if op in owned} | set(original_targets))
+
+        def evaluate(picks_by_shift, counters, values, targets: int, start: int, dirty_by_shift: Dict[int, set]):
+            """从 start 班次起重新结算；返回新的 (各班次选择, 各班次开始时的疲劳计数, 各班次效率)"""
+            picks_by_shift, counters, values = list(picks_by_shift), list(counters), list(values)
+            for s in range(start, 3):
+                c1, c2, c3 = counters[s]
+                values[s], used, picks_by_shift[s] = self._settle_shift(rooms, picks_by_shift[s], c1, c2, c3,
+                                                                        targets, dirty_by_shift.get(s, ()))
+                counters[s + 1] = (c1 | used, c2 | (c1 & used), c3 | (c2 & used))
+            return picks_by_shift, counters, values
+
+        targets_list = list(original_targets)
+        targets_mask = self.operators_to_mask(targets_list)
+        dirty0: Dict[int, set] = {}
+        for s, r in unmapped:
+            dirty0.setdefault(s, set()).add(r)
+        cur_day, cur_counters, cur_values = evaluate(day, [(0, 0, 0)] * 4, [0.0] * 3, targets_mask, 0, dirty0)
+        cur_value = sum(cur_values)
+        best_value, best_day, best_targets = cur_value, cur_day, list(targets_list)
+        temperature0 = max(cur_value, 1.0) * 1e-3
+        nonempty = [r for r in range(n) if rooms[r][3]]
+
+        while nonempty:
+            now = time.perf_counter()
+            if max_moves is not None and stats['moves'] >= max_moves:
+                break
+            if now >= deadline:
+                stats['deadline_hit'] = max_moves is not None
+                break
+            if max_moves is not None:
+                temperature = temperature0 * (1.0 - stats['moves'] / max_moves)
+            else:
+                temperature = temperature0 * max(deadline - now, 0.0) / max(time_limit, eps)
+            stats['moves'] += 1
+            new_targets, new_mask = targets_list, targets_mask
+            trial_day = list(cur_day)
+            dirty: Dict[int, set] = {}
+            move = rng.random()
+            if move < 0.6:
+                # 放入一个规则应用：偏向单位效率高的候选，挤掉本班次内冲突的选择
+                s, r = rng.randrange(3), rng.choice(nonempty)
+                cands = rooms[r][3]
+                c = cands[int(rng.random() ** 2 * len(cands))]
+                if c in trial_day[s][r]:
+                    continue
+                shift_picks = [tuple(p for p in picks if not p.mask & c.mask) for picks in trial_day[s]]
+                shift_picks[r] = (c,) + shift_picks[r]
+                trial_day[s] = shift_picks
+                dirty[s] = {i for i in range(n) if len(shift_picks[i]) < len(cur_day[s][i]) + (i == r)}
+                start = s
+                if rng.random() < 0.5:
+                    # 同时把这些干员从另一个班次撤下，留出班次上限
+                    other = rng.choice([t for t in range(3) if t != s])
+                    trial_day[other] = [tuple(p for p in picks if not p.mask & c.mask) for picks in trial_day[other]]
+                    dirty[other] = {i for i in range(n) if len(trial_day[other][i]) < len(cur_day[other][i])}
+                    start = min(s, other)
+            elif move < 0.8:
+                # 交换同一房间在两个班次的内容
+                r = rng.choice(nonempty)
+                a, b = sorted(rng.sample(range(3), 2))
+                if cur_day[a][r] == cur_day[b][r]:
+                    continue
+                trial_day[a], trial_day[b] = list(cur_day[a]), list(cur_day[b])
+                trial_day[a][r], trial_day[b][r] = cur_day[b][r], cur_day[a][r]
+                dirty = {a: {r}, b: {r}}
+                start = a
+            elif move < 0.9 or not target_pool:
+                # 撤下一个规则应用，空出的位置留给后续移动
+                s, r = rng.randrange(3), rng.randrange(n)
+                if not cur_day[s][r]:
+                    continue
+                drop = rng.randrange(len(cur_day[s][r]))
+                trial_day[s] = list(cur_day[s])
+                trial_day[s][r] = cur_day[s][r][:drop] + cur_day[s][r][drop + 1:]
+                start = s
+            else:
+                # 替换一个菲亚梅塔充能对象，影响全部班次的贸易站
+                op = rng.choice(target_pool)
+                if op in targets_list:
+                    continue
+                new_targets = list(targets_list)
+                new_targets[rng.randrange(len(new_targets))] = op
+                new_mask = self.operators_to_mask(new_targets)
+                dirty = {s: {r for r in range(n) if rooms[r][2]} for s in range(3)}
+                start = 0
+
+            trial_day, trial_counters, trial_values = evaluate(trial_day, cur_counters, cur_values, new_mask,
+                                                               start, dirty)
+            trial_value = sum(trial_values)
+            delta = trial_value - cur_value
+            if delta >= 0 or (temperature > 0 and rng.random() < math.exp(delta / temperature)):
+                stats['accepted'] += 1
+                cur_day, cur_counters, cur_values, cur_value = trial_day, trial_counters, trial_values, trial_value
+                targets_list, targets_mask = new_targets, new_mask
+                if cur_value > best_value + eps:
+                    best_value, best_day, best_targets = cur_value, cur_day, list(targets_list)
+                    stats['best_moves'] += 1
+
+        # 按真实流程重放最优方案（会重新检查疲劳并补位控制中枢）；重放需要临时换上对应的充能对象
+        self.fiammetta_targets = best_targets
+        try:
+            replay_value, _, plans, day_assignments = self._replay_day(rooms, best_day, ignore_elite,
+                                                                       fiammetta_enable)
+        finally:
+            self.fiammetta_targets = original_targets
+        stats['model_value'] = best_value
+        stats['elapsed'] = time.perf_counter() - started
+        if replay_value > base_value + eps:
+            stats['best_value'] = replay_value
+            stats['improved'] = True
+            stats['fiammetta_targets'] = list(best_targets)
+            return (plans, day_assignments), stats
+        return None, stats
+
     def _assign_drones(self, plan: Dict[str, Any], shift_index: int) -> Dict[str, Any]:
         """
         根据配置和当前排班计算无人机加速对象
@@ -1194,7 +3415,9 @@ class WorkplaceOptimizer:
         # 专门追踪菲亚梅塔带来的总收益
         fiammetta_gain_total = 0.0
         fiammetta_impact_rooms = set()
-        target_set = set(self.fiammetta_targets) if hasattr(self, 'fiammetta_targets') else set()
+        # 局部搜索换过充能对象的方案自带 fiammetta_targets
+        target_set = set(potential_assignments.get("fiammetta_targets",
+                                                   getattr(self, 'fiammetta_targets', [])))
 
         current_raw = current_assignments.get("raw_results", [])
         potential_raw = potential_assignments.get("raw_results", [])
@@ -1546,6 +3769,304 @@ class WorkplaceOptimizer:
             print(f"  - {w.id} {w.name} | 最大干员: {w.max_operators} | 基础效率: {w.base_efficiency}%")
 
 
+# ----------------- 结果缓存 -----------------
+
+class ResultCache:
+    """
+    线程安全的 LRU 结果缓存，按内容摘要（WorkplaceOptimizer.result_key）存取。
+    值以 pickle 字节保存：命中时返回独立的副本，调用方修改结果不会影响缓存；
+    内存按字节数统计，超过 max_bytes 或 max_entries 时淘汰最久未使用的条目。
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entries: int = 512):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Any:
+        """返回缓存结果的副本，未命中时返回 None"""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return pickle.loads(data)
+
+    def put(self, key: str, value: Any):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+# ----------------- 进程内规则缓存 -----------------
+
+# 规则文件路径 -> (文件状态 (mtime_ns, size), 文件内容摘要, 只加载了规则的优化器)
+_compiled_cache: Dict[str, Tuple[Tuple[int, int], str, WorkplaceOptimizer]] = {}
+_compiled_lock = threading.Lock()
+
+
+def get_compiled_optimizer(efficiency_file: str = "efficiency.json") -> WorkplaceOptimizer:
+    """
+    返回进程内共享的、只加载了规则的优化器（规则解析、展开、排序和房间模板只做一次）。
+    文件 mtime 或大小变化时重新计算内容摘要，内容确实变化才重新编译。
+    返回的实例只读共享，求解请通过 fork / solve / create_optimizer。
+    """
+    path = os.path.abspath(efficiency_file)
+    st = os.stat(path)
+    file_state = (st.st_mtime_ns, st.st_size)
+    entry = _compiled_cache.get(path)
+    if entry is not None and entry[0] == file_state:
+        return entry[2]
+
+    with _compiled_lock:
+        entry = _compiled_cache.get(path)
+        if entry is not None and entry[0] == file_state:
+            return entry[2]
+        with open(path, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        if entry is not None and entry[1] == digest:
+            optimizer = entry[2]
+        else:
+            optimizer = WorkplaceOptimizer(raw, [], {})
+        _compiled_cache[path] = (file_state, digest, optimizer)
+        return optimizer
+
+
+def create_optimizer(efficiency_file: str, operator_data: JsonSource,
+                     config_data: Optional[JsonSource] = None, vector_engine: bool = False) -> WorkplaceOptimizer:
+    """
+    在进程内缓存的规则之上创建某个干员数据和配置的优化器，只需加载干员和重建索引
+    :param vector_engine: 房间搜索使用 NumPy 引擎（见 VectorRoomEngine），适合规则很多的规则文件
+    """
+    return get_compiled_optimizer(efficiency_file).fork(operator_data, config_data or {}, vector_engine)
+
+
+# ----------------- 进程池共享的候选表 -----------------
+
+def export_vector_tables(optimizer: WorkplaceOptimizer
+                         ) -> Tuple[shared_memory.SharedMemory, Dict[Tuple[str, str], List[Tuple]]]:
+    """
+    构建优化器全部 (类型, 产物) 的 NumPy 候选表，把其中的数组依次复制到一块新建的共享内存（按 8 字节对齐），
+    返回 (共享内存, 布局)。布局记录每张表的 first、meeting_room 和各数组的 (dtype, 偏移, 长度)，
+    随进程池初始化参数传给子进程。共享内存由创建方负责释放。
+    """
+    tables = {key: optimizer.get_vector_tables(*key) for key in optimizer.vector_table_keys()}
+    layout: Dict[Tuple[str, str], List[Tuple]] = {}
+    offset = 0
+    for key, pair in tables.items():
+        layout[key] = []
+        for table in pair:
+            arrays = {}
+            for name in VectorRuleTable.ARRAYS:
+                array = getattr(table, name)
+                arrays[name] = (array.dtype.str, offset, len(array))
+                offset += -(-array.nbytes // 8) * 8
+            layout[key].append((table.first, table.meeting_room, arrays))
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 8))
+    for key, pair in tables.items():
+        for table, (_, _, arrays) in zip(pair, layout[key]):
+            for name, (dtype, start, length) in arrays.items():
+                np.ndarray(length, dtype=dtype, buffer=shm.buf, offset=start)[:] = getattr(table, name)
+    return shm, layout
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """按名称挂载已有的共享内存，由创建方负责释放"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.13 之前没有 track 参数；子进程与创建方共用同一个 resource_tracker，创建方 unlink 时一并注销
+        return shared_memory.SharedMemory(name=name)
+
+
+def attach_vector_tables(name: str, layout: Dict[Tuple[str, str], List[Tuple]]
+                         ) -> Tuple[shared_memory.SharedMemory, Dict[Tuple[str, str], Tuple[VectorRuleTable, ...]]]:
+    """挂载 export_vector_tables 导出的共享内存，返回 (共享内存, 候选表)；表中的数组是共享内存上的只读视图，不复制"""
+    shm = _attach_shared_memory(name)
+
+    def view(dtype: str, start: int, length: int) -> 'np.ndarray':
+        array = np.ndarray(length, dtype=dtype, buffer=shm.buf, offset=start)
+        array.flags.writeable = False
+        return array
+
+    tables = {key: tuple(VectorRuleTable({name: view(*spec) for name, spec in arrays.items()}, first, meeting_room)
+                         for first, meeting_room, arrays in entries)
+              for key, entries in layout.items()}
+    return shm, tables
+
+
+def _release_shared_memory(shm: shared_memory.SharedMemory):
+    shm.close()
+    shm.unlink()
+
+
+# ----------------- 进程池并行求解 -----------------
+
+_pool_optimizer: Optional[WorkplaceOptimizer] = None
+
+
+_pool_incumbents = None
+
+
+# 子进程挂载的候选表共享内存，在子进程的整个生命周期内保持映射
+_pool_shared_memory: Optional[shared_memory.SharedMemory] = None
+
+
+def _init_solver_pool(optimizer: WorkplaceOptimizer, incumbents=None, shared_tables=None):
+    global _pool_optimizer, _pool_incumbents, _pool_shared_memory
+    if shared_tables is not None:
+        _pool_shared_memory, optimizer._vector_tables = attach_vector_tables(*shared_tables)
+        optimizer._vector_engines = {}
+    _pool_optimizer = optimizer
+    _pool_incumbents = incumbents
+
+
+def get_pool_optimizer() -> Optional[WorkplaceOptimizer]:
+    """在 create_solver_pool 的子进程中返回启动时传入的优化器（只含规则），供其他模块的任务函数使用；其余进程返回 None"""
+    return _pool_optimizer
+
+
+def _solve_in_pool(operator_data, config_data, ignore_elite: bool, solver_options: Dict[str, Any]) -> Dict[str, Any]:
+    return _pool_optimizer.solve(operator_data, config_data, ignore_elite=ignore_elite, **solver_options)
+
+
+def _sweep_in_pool(operator_data, config_data, configs: List[Dict[str, Any]], ignore_elite: bool,
+                   solver_options: Dict[str, Any]):
+    return _pool_optimizer.fork(operator_data, config_data).evaluate_configs(configs, ignore_elite, **solver_options)
+
+
+def _what_if_in_pool(operator_data, config_data, candidates: List[Any], solver_options: Dict[str, Any]):
+    return _pool_optimizer.fork(operator_data, config_data).evaluate_upgrades(candidates, **solver_options)
+
+
+def _removals_in_pool(operator_data, config_data, names: List[str], solver_options: Dict[str, Any]):
+    return _pool_optimizer.fork(operator_data, config_data).evaluate_removals(names, **solver_options)
+
+
+def _restarts_in_pool(operator_data, config_data, seeds: List[Optional[int]], deadline: float, ignore_elite: bool,
+                      product_requirements: Optional[Dict[str, Dict[str, int]]]):
+    return _pool_optimizer.fork(operator_data, config_data).run_restarts(seeds, deadline, ignore_elite,
+                                                                         product_requirements)
+
+
+def _strategy_in_pool(operator_data, config_data, strategy: str, deadline: float, ignore_elite: bool,
+                      product_requirements: Optional[Dict[str, Dict[str, int]]], seed: int, slot: int):
+    incumbent = SharedIncumbent(_pool_incumbents, slot)
+    return _pool_optimizer.fork(operator_data, config_data).run_strategy(strategy, deadline, ignore_elite,
+                                                                         product_requirements, seed, incumbent)
+
+
+class SharedIncumbent:
+    """
+    组合求解中各策略共享的当前最优全天效率。
+    board 为 SolverPool.incumbents 时跨进程共享（每次组合求解占用其中一个槽位），为 None 时只在本进程内使用。
+    """
+
+    def __init__(self, board=None, slot: int = 0):
+        self.board = board if board is not None else [0.0]
+        self.slot = slot
+
+    def get(self) -> float:
+        return self.board[self.slot]
+
+    def offer(self, value: float) -> bool:
+        """提交一个全天效率，比当前最优高时更新并返回 True"""
+        get_lock = getattr(self.board, 'get_lock', None)
+        if get_lock is None:
+            if value > self.board[self.slot]:
+                self.board[self.slot] = value
+                return True
+            return False
+        with get_lock():
+            if value > self.board[self.slot]:
+                self.board[self.slot] = value
+                return True
+            return False
+
+
+class SolverPool(ProcessPoolExecutor):
+    """
+    求解进程池。除 ProcessPoolExecutor 的功能外，带有一个在子进程启动时继承的共享数组，
+    供组合求解的各策略交换当前最优效率，每次组合求解占用一个槽位。
+    优化器使用 NumPy 引擎时，全部候选表只导出一次到共享内存（shared_tables），子进程的房间搜索直接读取其中的数组；
+    共享内存在 shutdown 或进程退出时释放。
+    """
+
+    def __init__(self, optimizer: WorkplaceOptimizer, max_workers: Optional[int] = None, incumbent_slots: int = 64):
+        if max_workers is None:
+            max_workers = default_pool_size()
+        self.max_workers = max_workers
+        self.incumbents = multiprocessing.Array('d', incumbent_slots)
+        self._free_slots = list(range(incumbent_slots))
+        self._slot_lock = threading.Lock()
+        self.shared_tables: Optional[shared_memory.SharedMemory] = None
+        shared = None
+        if optimizer.vector_engine:
+            self.shared_tables, layout = export_vector_tables(optimizer)
+            shared = (self.shared_tables.name, layout)
+            self._release_tables = weakref.finalize(self, _release_shared_memory, self.shared_tables)
+        super().__init__(max_workers=max_workers, initializer=_init_solver_pool,
+                         initargs=(optimizer, self.incumbents, shared))
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        super().shutdown(wait=wait, cancel_futures=cancel_futures)
+        if self.shared_tables is not None:
+            self._release_tables()
+
+    def acquire_slot(self) -> Optional[int]:
+        """取得一个清零的共享槽位；全部占用时返回 None（调用方改为在本进程内依次运行）"""
+        with self._slot_lock:
+            if not self._free_slots:
+                return None
+            slot = self._free_slots.pop()
+        self.incumbents[slot] = 0.0
+        return slot
+
+    def release_slot(self, slot: int):
+        with self._slot_lock:
+            self._free_slots.append(slot)
+
+
+def default_pool_size() -> int:
+    """默认的子进程数：留一个核给调用方进程（它同时也参与求解），至少 1 个"""
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+def create_solver_pool(optimizer: WorkplaceOptimizer, max_workers: Optional[int] = None) -> SolverPool:
+    """
+    创建求解进程池：编译好的规则只在子进程启动时传送一次，之后每个任务只传干员数据和配置。
+    进程池应长期复用（例如每个进程创建一次），供 WorkplaceOptimizer.solve_both_modes / solve_monte_carlo /
+    solve_portfolio 使用。
+    :param max_workers: 子进程数，默认为 default_pool_size()
+    """
+    return SolverPool(optimizer, max_workers=max_workers)
+
+
 # if __name__ == "__main__":
 #     optimizer = WorkplaceOptimizer('efficiency.json', 'operators.json', 'config.json')
 #
@@ -0,0 +1,119 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from logic import WorkplaceOptimizer, content_hash
+
+
+# ----------------- 排班结果持久化存储 -----------------
+
+class PlanStore:
+    """
+    基于 SQLite 的排班结果存储，进程重启后和多个工作进程之间都可以复用已经算过的方案。
+    - 每条记录以 WorkplaceOptimizer.result_key 为主键（规则版本 + 干员数据 + 配置 + 求解参数）；
+    - 另外记录规则版本、干员数据摘要和配置摘要，规则更新后可按版本整批清除，
+      也可以按干员数据摘要查询最近一次的方案；
+    - 保存的是可直接序列化的内容：MAA 格式的排班 JSON、各房间效率和提升建议，不含 raw_results。
+    """
+
+    def __init__(self, path: str = "plans.sqlite3"):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS plans (
+                    key TEXT PRIMARY KEY,
+                    rules_version TEXT NOT NULL,
+                    roster_hash TEXT NOT NULL,
+                    config_hash TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    payload TEXT NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_plans_rules ON plans (rules_version)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_plans_roster ON plans (roster_hash, created_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 连接不能跨线程使用，每个线程各自持有一个
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def serialize_assignments(assignments: Dict[str, Any]) -> Dict[str, Any]:
+        """去掉 raw_results，并把其中各房间的效率整理为可序列化的 room_efficiency 列表"""
+        data = {k: v for k, v in assignments.items() if k != 'raw_results'}
+        rooms_per_shift = len(assignments['raw_results']) // max(len(assignments['plans']), 1)
+        data['room_efficiency'] = [
+            {
+                "shift": i // rooms_per_shift if rooms_per_shift else 0,
+                "room": r.workplace.name,
+                "total_efficiency": r.total_efficiency,
+                "operator_efficiency": r.operator_efficiency,
+                "operators": [op.name for op in r.optimal_operators],
+            }
+            for i, r in enumerate(assignments['raw_results'])
+        ]
+        return data
+
+    def put(self, optimizer: WorkplaceOptimizer, key: str, kind: str, record: Dict[str, Any]):
+        """保存一条记录；optimizer 为求解所用的（fork 出的）优化器，用于记录规则版本和数据摘要"""
+        payload = json.dumps(record, ensure_ascii=False, default=str)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO plans (key, rules_version, roster_hash, config_hash, kind, created_at, payload)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, optimizer.rules_version, content_hash(optimizer.operator_data),
+                 content_hash(optimizer.config_data), kind, time.time(), payload))
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT payload FROM plans WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_or_solve(self, optimizer: WorkplaceOptimizer, executor=None, cache=None,
+                     **solver_options) -> Dict[str, Any]:
+        """
+        查询或计算当前练度方案、潜在方案和提升建议（同 WorkplaceOptimizer.solve_both_modes）。
+        :param optimizer: 已载入干员数据和配置的优化器（如 create_optimizer 的返回值）
+        :return: {"current": ..., "potential": ..., "upgrades": [...]}，方案中含 room_efficiency
+        """
+        key = optimizer.result_key('both_modes', **solver_options)
+        record = self.get(key)
+        if record is None:
+            current, potential, upgrades = optimizer.solve_both_modes(executor=executor, cache=cache,
+                                                                      **solver_options)
+            record = {
+                "current": self.serialize_assignments(current),
+                "potential": self.serialize_assignments(potential),
+                "upgrades": upgrades,
+            }
+            self.put(optimizer, key, 'both_modes', record)
+            # 与直接读出的记录保持一致（例如集合已转为字符串）
+            record = json.loads(json.dumps(record, ensure_ascii=False, default=str))
+        return record
+
+    def latest_for_roster(self, roster_hash: str, rules_version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """按干员数据摘要（content_hash(operator_data)）查询最近一次保存的记录，可限定规则版本"""
+        sql = "SELECT payload FROM plans WHERE roster_hash = ?"
+        params: List[Any] = [roster_hash]
+        if rules_version is not None:
+            sql += " AND rules_version = ?"
+            params.append(rules_version)
+        row = self._connect().execute(sql + " ORDER BY created_at DESC LIMIT 1", params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def purge_stale(self, rules_version: str) -> int:
+        """删除不属于指定规则版本的全部记录，返回删除条数"""
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM plans WHERE rules_version != ?", (rules_version,)).rowcount
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,59 @@
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import logic  # noqa: E402
+
+EFFICIENCY_FILE = os.path.join(ROOT, "efficiency.json")
+
+# 与 app 中常见的几种布局对应：(贸易站数, 制造站数, 贸易站产物, 制造站产物)
+LAYOUTS = [
+    (2, 4, {"LMD": 2, "Orundum": 0}, {"Pure Gold": 2, "Originium Shard": 0, "Battle Record": 2}),
+    (3, 3, {"LMD": 2, "Orundum": 1}, {"Pure Gold": 2, "Originium Shard": 1, "Battle Record": 0}),
+    (1, 5, {"LMD": 1, "Orundum": 0}, {"Pure Gold": 2, "Originium Shard": 0, "Battle Record": 3}),
+]
+
+
+@pytest.fixture(scope="session")
+def compiled():
+    return logic.get_compiled_optimizer(EFFICIENCY_FILE)
+
+
+@pytest.fixture(scope="session")
+def operator_names(compiled):
+    """规则中出现的全部干员（加上菲亚梅塔和阿米娅），编译后的编号表即为这些干员"""
+    return sorted(set(compiled.operator_names) | {"菲亚梅塔", "阿米娅"})
+
+
+def make_roster(names, seed, owned_ratio=None):
+    """按种子随机生成 MAA 导出格式的干员数据：持有比例和精英化等级随机"""
+    rng = random.Random(seed)
+    ratio = rng.choice([0.3, 0.6, 0.9, 1.0]) if owned_ratio is None else owned_ratio
+    roster = []
+    for i, name in enumerate(names):
+        own = rng.random() < ratio
+        roster.append({"id": f"char_{i}", "name": name, "elite": rng.choice([0, 1, 2, 2]) if own else 0,
+                       "level": 1, "own": own, "potential": 1, "rarity": 5})
+    return roster
+
+
+def make_config(seed):
+    trading, manufacturing, trading_products, manufacturing_products = LAYOUTS[seed % len(LAYOUTS)]
+    return {
+        "product_requirements": {"trading_stations": trading_products,
+                                 "manufacturing_stations": manufacturing_products},
+        "trading_stations_count": trading, "manufacturing_stations_count": manufacturing,
+        "Fiammetta": {"enable": seed % 2 == 0},
+        "drones": {"enable": seed % 3 == 0, "order": "pre", "targets": ["LMD", "Pure Gold", "LMD"]},
+    }
+
+
+@pytest.fixture(scope="session")
+def cases(operator_names):
+    """若干组随机干员数据和布局配置"""
+    return [(make_roster(operator_names, seed), make_config(seed)) for seed in range(6)]
@@ -0,0 +1,43 @@
+import copy
+import os
+import pickle
+import threading
+
+import logic
+from conftest import EFFICIENCY_FILE
+
+
+def test_forks_share_the_intern_lock(compiled, cases):
+    roster, config = cases[0]
+    first, second = compiled.fork(roster, config), compiled.fork(roster, config)
+    assert first._intern_lock is compiled._intern_lock
+    assert second._intern_lock is first._intern_lock
+    assert copy.copy(first)._intern_lock is compiled._intern_lock
+    # 只有序列化（进程池初始化）时才重建锁
+    assert pickle.loads(pickle.dumps(first))._intern_lock is not compiled._intern_lock
+
+
+def test_concurrent_interning_assigns_unique_ids():
+    # 独立编译一份，避免新干员名进入进程内共享的编号表
+    compiled = logic.WorkplaceOptimizer(EFFICIENCY_FILE, [], {})
+    names = [f"并发测试干员{i}" for i in range(400)]
+    workers = [compiled.fork([], {}) for _ in range(4)]
+    barrier = threading.Barrier(len(workers))
+
+    def intern_all(worker):
+        barrier.wait()
+        for name in names:
+            worker.intern_operator(name)
+
+    threads = [threading.Thread(target=intern_all, args=(worker,)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    ids = [compiled.operator_ids[name] for name in names]
+    assert len(set(ids)) == len(names)
+    assert all(compiled.operator_names[i] == name for i, name in zip(ids, names))
+
+
+def test_default_pool_size_leaves_a_core_free():
+    assert logic.default_pool_size() == max(1, (os.cpu_count() or 1) - 1)
@@ -0,0 +1,49 @@
+import io
+import json
+
+import pytest
+
+import batch
+from conftest import EFFICIENCY_FILE
+
+
+def test_run_batch_reports_bad_lines(compiled, cases):
+    roster, config = cases[0]
+    lines = [
+        json.dumps({"id": "ok", "operators": roster, "config": config}, ensure_ascii=False),
+        "",
+        "{not json",
+        "[1, 2]",
+        json.dumps({"id": "broken", "operators": [1, 2]}),
+    ]
+    output = io.StringIO()
+    stats = batch.run_batch(io.StringIO("\n".join(lines) + "\n"), output, EFFICIENCY_FILE, workers=1)
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert stats["records"] == 4 and stats["errors"] == 3
+
+    ok, bad_json, not_object, broken = results
+    assert (ok["id"], ok["line"]) == ("ok", 1)
+    assert ok == json.loads(json.dumps(batch.solve_record({"id": "ok", "line": 1, "operators": roster,
+                                                           "config": config}, {}, compiled),
+                                       ensure_ascii=False, default=str))
+    assert bad_json["line"] == 3 and "JSON" in bad_json["error"]
+    assert not_object["line"] == 4 and "error" in not_object
+    assert broken["id"] == "broken" and broken["line"] == 5 and broken["error"].startswith("TypeError")
+
+
+@pytest.mark.parametrize("workers, max_pending", [(1, None), (2, 2)])
+def test_iter_batch_bounds_records_in_flight(cases, workers, max_pending):
+    consumed = []
+
+    def records():
+        for i in range(8):
+            roster, config = cases[i % len(cases)]
+            consumed.append(i)
+            yield {"id": i, "line": i + 1, "operators": roster, "config": config}
+
+    received = []
+    for result in batch.iter_batch(records(), EFFICIENCY_FILE, workers=workers, max_pending=max_pending):
+        assert "error" not in result
+        received.append(result["id"])
+        assert len(consumed) <= len(received) + (max_pending or 1) - 1
+    assert sorted(received) == list(range(8))
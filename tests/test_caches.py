@@ -0,0 +1,105 @@
+import json
+import os
+import shutil
+from collections import defaultdict
+
+import logic
+from conftest import EFFICIENCY_FILE
+
+
+# ----------------- 进程内规则缓存 -----------------
+
+def test_compiled_optimizer_follows_file_changes(tmp_path):
+    path = tmp_path / "efficiency.json"
+    shutil.copy(EFFICIENCY_FILE, path)
+    first = logic.get_compiled_optimizer(str(path))
+    assert logic.get_compiled_optimizer(str(path)) is first
+
+    # 只改 mtime、内容不变：重新计算摘要但不重新编译
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert logic.get_compiled_optimizer(str(path)) is first
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    systems = next(iter(data["combination_rules"].values()))
+    next(iter(systems.values()))["rules"][0]["efficiency"] += 1
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 2 * 10 ** 9))
+    second = logic.get_compiled_optimizer(str(path))
+    assert second is not first
+    assert second.rules_version != first.rules_version
+    assert logic.get_compiled_optimizer(str(path)) is second
+
+
+# ----------------- 结果缓存 -----------------
+
+def test_result_cache_evicts_least_recently_used():
+    cache = logic.ResultCache(max_entries=2)
+    cache.put("a", {"value": 1})
+    cache.put("b", {"value": 2})
+    assert cache.get("a") == {"value": 1}
+    cache.put("c", {"value": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"value": 1} and cache.get("c") == {"value": 3}
+    assert cache.stats()['entries'] == 2
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_result_cache_respects_the_byte_cap():
+    payload = "x" * 1000
+    cache = logic.ResultCache(max_bytes=2500)
+    for key in "abc":
+        cache.put(key, payload)
+    assert cache.get("a") is None
+    assert cache.get("b") == payload and cache.get("c") == payload
+    assert cache.stats()['bytes'] <= 2500
+    cache.put("huge", "y" * 5000)
+    assert cache.get("huge") is None and cache.stats()['entries'] == 2
+
+
+def test_result_cache_returns_independent_copies(compiled, cases):
+    roster, config = cases[0]
+    cache = logic.ResultCache()
+    first = compiled.solve(roster, config, cache=cache)
+    first['plans'].clear()
+    second = compiled.solve(roster, config, cache=cache)
+    assert second['plans'] and cache.hits == 1
+    assert compiled.solve(roster, config, cache=cache, ignore_elite=True)['plans']
+    assert cache.misses == 2
+
+
+# ----------------- 房间置换表 -----------------
+
+def test_room_cache_replays_hits(compiled, cases):
+    roster, config = cases[1]
+    worker = compiled.fork(roster, config)
+    workplace = worker.workplaces['trading_stations'][0]
+    first_usage, first_used = defaultdict(int), set()
+    first = worker.optimize_workplace(workplace, first_usage, first_used)
+    assert first.optimal_operators
+    assert worker.room_cache_info() == {'hits': 0, 'misses': 1, 'entries': 1}
+
+    usage, used = defaultdict(int), set()
+    second = worker.optimize_workplace(workplace, usage, used)
+    assert worker.room_cache_info() == {'hits': 1, 'misses': 1, 'entries': 1}
+    assert second.optimal_operators == first.optimal_operators
+    assert second.total_efficiency == first.total_efficiency
+    assert (usage, used) == (first_usage, first_used)
+
+    # 规则成员已上班时键不同，重新计算
+    busy = first.optimal_operators[0].name
+    third = worker.optimize_workplace(workplace, defaultdict(int), {busy})
+    assert worker.room_cache_info()['misses'] == 2
+    assert busy not in [op.name for op in third.optimal_operators]
+
+
+def test_room_cache_keeps_plans_unchanged(compiled, cases):
+    roster, config = cases[2]
+    worker = compiled.fork(roster, config)
+    first = worker.get_optimal_assignments()
+    misses = worker.room_cache_info()['misses']
+    second = worker.get_optimal_assignments()
+    info = worker.room_cache_info()
+    assert info['hits'] > 0 and info['misses'] == misses
+    assert second['plans'] == first['plans']
+    assert compiled.fork(roster, config).room_cache_info() == {'hits': 0, 'misses': 0, 'entries': 0}
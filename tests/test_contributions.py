@@ -0,0 +1,38 @@
+import pytest
+
+import logic
+
+EPS = 1e-6
+
+
+def fresh(compiled, roster, config, **options):
+    return compiled.solve(roster, config, **options)['daily_efficiency']
+
+
+# ----------------- 干员贡献 -----------------
+
+def test_operator_contributions_match_fresh_solves(compiled, cases):
+    for roster, config in cases[:3]:
+        base = fresh(compiled, roster, config)
+        evaluations = compiled.operator_contributions(roster, config)
+        assert evaluations
+        for evaluation in evaluations[:4] + evaluations[-2:]:
+            modified = [dict(entry, own=False) if entry['name'] == evaluation['name'] else entry
+                        for entry in roster]
+            drop = base - fresh(compiled, modified, config)
+            assert evaluation['loss'] == pytest.approx(max(drop, 0.0), abs=EPS)
+            assert evaluation['better_without'] == pytest.approx(max(-drop, 0.0), abs=EPS)
+
+
+def test_operator_contributions_cover_assigned_operators(compiled, cases):
+    roster, config = cases[2]
+    worker = compiled.fork(roster, config)
+    assigned = set(worker.assigned_operators(worker.get_optimal_assignments()))
+    evaluations = compiled.operator_contributions(roster, config)
+    assert {evaluation['name'] for evaluation in evaluations} == assigned
+    pool = logic.create_solver_pool(compiled, max_workers=1)
+    try:
+        assert compiled.operator_contributions(roster, config, executor=pool) == evaluations
+    finally:
+        pool.shutdown()
+    assert compiled.operator_contributions([], {}) == []
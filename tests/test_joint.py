@@ -0,0 +1,44 @@
+from collections import Counter
+
+import pytest
+
+EPS = 1e-6
+
+
+def fresh(compiled, roster, config, **options):
+    return compiled.solve(roster, config, **options)['daily_efficiency']
+
+
+# ----------------- 三班联合排班 -----------------
+
+@pytest.mark.parametrize("ignore_elite", [False, True])
+def test_joint_never_below_greedy(compiled, cases, ignore_elite):
+    for roster, config in cases:
+        greedy = fresh(compiled, roster, config, ignore_elite=ignore_elite)
+        joint = compiled.solve(roster, config, ignore_elite=ignore_elite, solver="joint", time_limit=0.5)
+        assert joint['daily_efficiency'] >= greedy - EPS
+        stats = joint['solver_stats'][-1]
+        assert stats['greedy_value'] == pytest.approx(greedy)
+        assert stats['best_value'] == pytest.approx(joint['daily_efficiency'])
+
+
+def test_joint_respects_fatigue(compiled, cases):
+    """生产房间中每名干员全天最多上 2 班，菲亚梅塔的充能对象最多 3 班"""
+    for roster, config in cases:
+        result = compiled.solve(roster, config, solver="joint", time_limit=0.5)
+        shifts = Counter()
+        targets = set()
+        for plan in result['plans']:
+            targets.add(plan['Fiammetta']['target'])
+            for kind in ("trading", "manufacture", "power"):
+                for room in plan['rooms'].get(kind, []):
+                    shifts.update(room['operators'])
+        assert shifts
+        assert all(count <= (3 if name in targets else 2) for name, count in shifts.items())
+
+
+def test_joint_on_empty_rosters(compiled, operator_names):
+    unowned = [{"id": f"char_{i}", "name": name, "elite": 0, "level": 1, "own": False, "potential": 1,
+                "rarity": 5} for i, name in enumerate(operator_names)]
+    for roster in ([], unowned):
+        assert fresh(compiled, roster, {}, solver="joint", time_limit=0.2) == 0
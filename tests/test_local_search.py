@@ -0,0 +1,45 @@
+import random
+
+EPS = 1e-6
+
+
+def test_improve_never_below_start(compiled, cases):
+    for roster, config in cases:
+        greedy = compiled.solve(roster, config)
+        improved = compiled.solve(roster, config, improve_time=5.0, improve_moves=300)
+        assert improved['daily_efficiency'] >= greedy['daily_efficiency'] - EPS
+        stats = improved['solver_stats'][-1]
+        assert stats['start_value'] == greedy['daily_efficiency']
+        assert stats['moves'] == 300 and not stats['deadline_hit']
+
+
+def test_improve_is_reproducible_by_move_count(compiled, cases):
+    roster, config = cases[1]
+    first = compiled.solve(roster, config, improve_time=5.0, improve_moves=500, seed=3)
+    second = compiled.solve(roster, config, improve_time=5.0, improve_moves=500, seed=3)
+    assert first['plans'] == second['plans']
+    assert first['daily_efficiency'] == second['daily_efficiency']
+
+
+def test_improve_leaves_fiammetta_targets_alone(compiled, cases):
+    roster, config = cases[0]
+    worker = compiled.fork(roster, config)
+    result = worker.get_optimal_assignments()
+    targets = list(worker.fiammetta_targets)
+    worker.improve_day(result, fiammetta_enable=True, time_limit=5.0, max_moves=300)
+    assert worker.fiammetta_targets == targets
+
+
+def test_replay_keeps_a_consistent_day(compiled, cases):
+    """局部搜索模型中的一天经真实流程重放后，各房间保留的选择仍满足同一套接受规则"""
+    rng = random.Random(0)
+    for roster, config in cases:
+        worker = compiled.fork(roster, config)
+        rooms = worker.build_day_rooms()
+        day = worker.randomized_day(rooms, rng)
+        _, day_choices, _, _ = worker._replay_day(rooms, day, False, False)
+        for shift_picks, choices in zip(day, day_choices):
+            for (workplace, _, _, _), picks in zip(rooms, shift_picks):
+                kept = choices[workplace.id]
+                assert sum(c.slots for c in kept) <= workplace.max_operators
+                assert all(c in picks for c in kept)
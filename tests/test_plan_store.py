@@ -0,0 +1,44 @@
+import copy
+import time
+
+from logic import content_hash
+from plan_store import PlanStore
+
+
+def test_get_or_solve_survives_reopening(tmp_path, compiled, cases):
+    roster, config = cases[0]
+    worker = compiled.fork(roster, config)
+    path = str(tmp_path / "plans.sqlite3")
+    store = PlanStore(path)
+    first = store.get_or_solve(worker)
+    assert set(first) == {"current", "potential", "upgrades"}
+    assert "raw_results" not in first["current"] and first["current"]["room_efficiency"]
+    store.close()
+
+    reopened = PlanStore(path)
+    assert reopened.get(worker.result_key('both_modes')) == first
+    assert reopened.get_or_solve(worker) == first
+    reopened.close()
+
+
+def test_latest_for_roster_and_purge_stale(tmp_path, compiled, cases):
+    roster, config = cases[1]
+    worker = compiled.fork(roster, config)
+    stale = copy.copy(worker)
+    stale.rules_version = "old-rules"
+    store = PlanStore(str(tmp_path / "plans.sqlite3"))
+    roster_hash = content_hash(worker.operator_data)
+
+    store.put(worker, "k1", "both_modes", {"n": 1})
+    time.sleep(0.01)
+    store.put(worker, "k2", "both_modes", {"n": 2})
+    time.sleep(0.01)
+    store.put(stale, "k3", "both_modes", {"n": 3})
+    assert store.latest_for_roster(roster_hash) == {"n": 3}
+    assert store.latest_for_roster(roster_hash, worker.rules_version) == {"n": 2}
+    assert store.latest_for_roster(content_hash([])) is None
+
+    assert store.purge_stale(worker.rules_version) == 1
+    assert store.get("k3") is None and store.get("k1") == {"n": 1}
+    assert store.latest_for_roster(roster_hash) == {"n": 2}
+    store.close()
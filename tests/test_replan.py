@@ -0,0 +1,52 @@
+import copy
+import random
+
+import pytest
+
+
+# ----------------- 增量重新规划 -----------------
+
+def random_changes(rng, roster):
+    """随机修改一到三名干员：已持有的多半调整精英化等级，其余切换持有状态"""
+    changes = []
+    for _ in range(rng.choice([1, 1, 2, 3])):
+        entry = dict(rng.choice(roster))
+        if entry['own'] and rng.random() < 0.8:
+            entry['elite'] = entry['elite'] + 1 if entry['elite'] < 2 else rng.randrange(2)
+        else:
+            entry['own'] = not entry['own']
+        changes.append(entry)
+    return changes
+
+
+def test_replan_matches_fresh_solve(compiled, cases):
+    rng = random.Random(1)
+    for roster, config in cases:
+        session = compiled.fork(copy.deepcopy(roster), config)
+        session.replan_both_modes([])
+        roster = copy.deepcopy(roster)
+        for _ in range(8):
+            changes = random_changes(rng, roster)
+            by_id = {entry['id']: entry for entry in changes}
+            roster = [by_id.get(entry['id'], entry) for entry in roster]
+            current, potential, upgrades = session.replan_both_modes(changes)
+            expected = compiled.solve_both_modes(roster, config)
+            assert current['plans'] == expected[0]['plans']
+            assert potential['plans'] == expected[1]['plans']
+            assert current['daily_efficiency'] == pytest.approx(expected[0]['daily_efficiency'])
+            assert upgrades == expected[2]
+
+
+def test_replan_keeps_unaffected_rooms(compiled, cases):
+    roster, config = cases[0]
+    session = compiled.fork(copy.deepcopy(roster), config)
+    session.replan([])
+    unchanged = session.replan([dict(entry) for entry in roster[:5]])
+    stats = unchanged['solver_stats'][-1]
+    assert stats['changed'] == [] and stats['evicted'] == 0 and stats['room_misses'] == 0
+
+    entry = next(entry for entry in roster if entry['own'] and entry['elite'] < 2)
+    result = session.replan([dict(entry, elite=2)])
+    stats = result['solver_stats'][-1]
+    assert stats['changed'] == [entry['name']]
+    assert stats['room_hits'] > 0
@@ -0,0 +1,65 @@
+import pytest
+
+import logic
+
+EPS = 1e-6
+
+
+def fresh(compiled, roster, config, **options):
+    return compiled.solve(roster, config, **options)['daily_efficiency']
+
+
+def unowned_roster(operator_names):
+    return [{"id": f"char_{i}", "name": name, "elite": 0, "level": 1, "own": False, "potential": 1,
+             "rarity": 5} for i, name in enumerate(operator_names)]
+
+
+# ----------------- 随机重启搜索 -----------------
+
+@pytest.mark.parametrize("ignore_elite", [False, True])
+def test_monte_carlo_never_below_greedy(compiled, cases, ignore_elite):
+    for roster, config in cases:
+        greedy = fresh(compiled, roster, config, ignore_elite=ignore_elite)
+        result = compiled.solve_monte_carlo(roster, config, ignore_elite=ignore_elite, restarts=4, time_limit=5.0)
+        assert result['daily_efficiency'] >= greedy - EPS
+        stats = result['solver_stats'][-1]
+        assert stats['greedy_value'] == pytest.approx(greedy)
+        assert stats['best_value'] == max(run['daily_efficiency'] for run in stats['restarts'])
+        assert stats['completed'] == 5 and not stats['deadline_hit']
+
+
+def test_monte_carlo_results_depend_only_on_the_seed(compiled, cases):
+    roster, config = cases[3]
+    first = compiled.solve_monte_carlo(roster, config, restarts=6, seed=5, time_limit=10.0)
+    pool = logic.create_solver_pool(compiled, max_workers=1)
+    try:
+        pooled = compiled.solve_monte_carlo(roster, config, restarts=6, seed=5, time_limit=10.0, executor=pool)
+    finally:
+        pool.shutdown()
+    assert pooled['plans'] == first['plans']
+    assert [run['seed'] for run in pooled['solver_stats'][-1]['restarts']] == \
+        [run['seed'] for run in first['solver_stats'][-1]['restarts']]
+
+
+def test_monte_carlo_on_empty_rosters(compiled, operator_names):
+    for roster in ([], unowned_roster(operator_names)):
+        assert compiled.solve_monte_carlo(roster, {}, restarts=2, time_limit=0.2)['daily_efficiency'] == 0
+
+
+# ----------------- 组合求解 -----------------
+
+@pytest.mark.parametrize("ignore_elite", [False, True])
+def test_portfolio_never_below_greedy(compiled, cases, ignore_elite):
+    for roster, config in cases:
+        greedy = fresh(compiled, roster, config, ignore_elite=ignore_elite)
+        result = compiled.solve_portfolio(roster, config, ignore_elite=ignore_elite, time_limit=1.0)
+        assert result['daily_efficiency'] >= greedy - EPS
+        stats = result['solver_stats'][0]
+        values = {run['strategy']: run['daily_efficiency'] for run in stats['strategies']}
+        assert stats['best_value'] == max(values.values()) == values[stats['best_strategy']]
+        assert values['greedy'] == pytest.approx(greedy)
+
+
+def test_portfolio_on_empty_rosters(compiled, operator_names):
+    for roster in ([], unowned_roster(operator_names)):
+        assert compiled.solve_portfolio(roster, {}, time_limit=0.2)['daily_efficiency'] == 0
@@ -0,0 +1,41 @@
+import random
+
+from logic import RuleMatcher
+
+
+def rescan(rules, blocked):
+    """逐条检查：组合规则要求成员全部可用，apply_each 规则至少一名成员可用"""
+    return [rule for rule in rules
+            if (rule.operator_mask & ~blocked if rule.apply_each else not rule.operator_mask & blocked)]
+
+
+def test_rule_matcher_matches_a_full_rescan(compiled, cases):
+    rng = random.Random(0)
+    for roster, config in cases:
+        worker = compiled.fork(roster, config)
+        for workplace_type, product in worker.rule_index:
+            rules = worker.get_rules(workplace_type, product)
+            blocked = worker.get_blocked_mask(workplace_type, {})
+            matcher = RuleMatcher(rules, worker.get_rule_postings(workplace_type, product), blocked)
+            assert matcher.fireable() == rescan(rules, blocked)
+            members = sorted({name for rule in rules for name in rule.operators})
+            for name in rng.sample(members, min(len(members), 12)):
+                op_id = worker.intern_operator(name)
+                matcher.place(op_id)
+                matcher.place(op_id)  # 重复上岗不改变计数
+                blocked |= 1 << op_id
+                assert matcher.blocked == blocked
+                assert matcher.fireable() == rescan(rules, blocked)
+
+
+def test_rule_postings_list_every_member(compiled, cases):
+    roster, config = cases[0]
+    worker = compiled.fork(roster, config)
+    for workplace_type, product in worker.rule_index:
+        rules = worker.get_rules(workplace_type, product)
+        postings = worker.get_rule_postings(workplace_type, product)
+        expected = {}
+        for i, rule in enumerate(rules):
+            for name in dict.fromkeys(rule.operators):
+                expected.setdefault(worker.intern_operator(name), []).append(i)
+        assert postings == expected
@@ -0,0 +1,53 @@
+import pytest
+
+EPS = 1e-6
+
+
+def fresh(compiled, roster, config, **options):
+    return compiled.solve(roster, config, **options)['daily_efficiency']
+
+
+# ----------------- 单班次精确求解 -----------------
+
+@pytest.mark.parametrize("ignore_elite", [False, True])
+def test_exact_never_below_greedy(compiled, cases, ignore_elite):
+    for roster, config in cases:
+        greedy = fresh(compiled, roster, config, ignore_elite=ignore_elite)
+        result = compiled.solve(roster, config, ignore_elite=ignore_elite, solver="exact", time_limit=0.5)
+        assert result['daily_efficiency'] >= greedy - EPS
+        for value, stats in zip(result['shift_efficiency'], result['solver_stats']):
+            assert stats['best_value'] >= stats['greedy_value'] - EPS
+            assert stats['improved'] == (stats['best_value'] > stats['greedy_value'] + EPS)
+            assert value == pytest.approx(stats['best_value'])
+
+
+def test_exact_first_shift_is_optimal(compiled, cases):
+    """搜索完整结束时，第一个班次的效率不低于其他求解模式给出的第一个班次"""
+    checked = 0
+    for roster, config in cases:
+        result = compiled.solve(roster, config, solver="exact", time_limit=1.5)
+        if result['solver_stats'][0]['aborted']:
+            continue
+        checked += 1
+        others = [compiled.solve(roster, config, solver="joint", time_limit=0.5)] + \
+            [compiled.solve(roster, config, solver="randomized", seed=seed) for seed in range(3)]
+        assert all(other['shift_efficiency'][0] <= result['shift_efficiency'][0] + EPS for other in others)
+    assert checked
+
+
+# ----------------- 空干员数据 -----------------
+
+@pytest.mark.parametrize("solver", ["greedy", "exact"])
+def test_empty_rosters_score_zero(compiled, operator_names, solver):
+    unowned = [{"id": f"char_{i}", "name": name, "elite": 0, "level": 1, "own": False, "potential": 1,
+                "rarity": 5} for i, name in enumerate(operator_names)]
+    for roster in ([], unowned):
+        for ignore_elite in (False, True):
+            result = compiled.solve(roster, {}, ignore_elite=ignore_elite, solver=solver, time_limit=0.2)
+            assert result['daily_efficiency'] == 0
+
+
+def test_empty_roster_analyses(compiled):
+    current, potential, upgrades = compiled.solve_both_modes([], {})
+    assert current['daily_efficiency'] == 0 and potential['daily_efficiency'] == 0
+    assert upgrades == []
@@ -0,0 +1,36 @@
+from math import comb
+
+import pytest
+
+import logic
+from logic import WorkplaceOptimizer
+
+
+def test_layout_configs_cover_every_split():
+    configs = WorkplaceOptimizer.layout_configs({"Fiammetta": {"enable": True}})
+    rooms = WorkplaceOptimizer.PRODUCTION_ROOMS
+    assert len(configs) == sum((t + 1) * comb(rooms - t + 2, 2) for t in range(rooms + 1))
+    for config in configs:
+        requirements = config["product_requirements"]
+        assert sum(requirements["trading_stations"].values()) == config["trading_stations_count"]
+        assert sum(requirements["manufacturing_stations"].values()) == config["manufacturing_stations_count"]
+        assert config["Fiammetta"] == {"enable": True}
+
+
+def test_sweep_ranks_by_daily_efficiency(compiled, cases):
+    roster, config = cases[1]
+    rows = compiled.sweep_layouts(roster, config, trading_counts=[2, 3])
+    assert len(rows) == len(WorkplaceOptimizer.layout_configs(config, [2, 3]))
+    assert [row["rank"] for row in rows] == list(range(1, len(rows) + 1))
+    values = [row["daily_efficiency"] for row in rows]
+    assert values == sorted(values, reverse=True)
+    for row in rows[:3] + rows[-1:]:
+        assert compiled.solve(roster, row["config"])["daily_efficiency"] == pytest.approx(row["daily_efficiency"])
+
+    pool = logic.create_solver_pool(compiled, max_workers=1)
+    try:
+        pooled = compiled.sweep_layouts(roster, config, trading_counts=[2, 3], executor=pool)
+    finally:
+        pool.shutdown()
+    assert [(row["rank"], row["config"], row["daily_efficiency"]) for row in pooled] == \
+        [(row["rank"], row["config"], row["daily_efficiency"]) for row in rows]
@@ -0,0 +1,76 @@
+import pytest
+
+import logic
+from logic import WorkplaceOptimizer
+
+EPS = 1e-6
+
+
+def fresh(compiled, roster, config, **options):
+    return compiled.solve(roster, config, **options)['daily_efficiency']
+
+
+def apply_items(roster, items):
+    targets = dict(items)
+    return [dict(entry, elite=targets[entry['name']]) if entry['name'] in targets else entry for entry in roster]
+
+
+# ----------------- 单项提升评估 -----------------
+
+def test_what_if_upgrades_match_fresh_solves(compiled, cases):
+    for roster, config in cases[:3]:
+        base = fresh(compiled, roster, config)
+        evaluations = compiled.what_if_upgrades(roster, config)
+        assert evaluations
+        for evaluation in evaluations[:4] + evaluations[-2:]:
+            modified = apply_items(roster, WorkplaceOptimizer.upgrade_items(evaluation))
+            assert evaluation['gain'] == pytest.approx(fresh(compiled, modified, config) - base, abs=EPS)
+
+
+def test_what_if_upgrades_are_ranked_and_pooled(compiled, cases):
+    roster, config = cases[1]
+    evaluations = compiled.what_if_upgrades(roster, config)
+    gains = [evaluation['gain'] for evaluation in evaluations]
+    assert gains == sorted(gains, reverse=True)
+    pool = logic.create_solver_pool(compiled, max_workers=1)
+    try:
+        assert compiled.what_if_upgrades(roster, config, executor=pool) == evaluations
+    finally:
+        pool.shutdown()
+    assert compiled.what_if_upgrades([], {}) == []
+
+
+# ----------------- 多步提升路线 -----------------
+
+def test_upgrade_path_steps_match_fresh_solves(compiled, cases):
+    for roster, config in cases[:3]:
+        path = compiled.plan_upgrade_path(roster, config, max_steps=6)
+        assert path['base_efficiency'] == pytest.approx(fresh(compiled, roster, config))
+        current, previous = roster, path['base_efficiency']
+        for number, step in enumerate(path['steps'], 1):
+            assert step['step'] == number
+            current = apply_items(current, WorkplaceOptimizer.upgrade_items(step))
+            value = fresh(compiled, current, config)
+            assert step['gain'] == pytest.approx(value - previous, abs=EPS)
+            assert step['gain'] > 0.01
+            assert step['cumulative_gain'] == pytest.approx(value - path['base_efficiency'], abs=EPS)
+            previous = value
+        assert path['final_efficiency'] == pytest.approx(previous, abs=EPS)
+
+
+def test_upgrade_path_starts_with_the_best_single_step(compiled, cases):
+    roster, config = cases[0]
+    worker = compiled.fork(roster, config)
+    candidates = [(item,) for item in worker.upgrade_candidates()] + worker.upgrade_bundles()
+    evaluations = compiled.what_if_upgrades(roster, config, candidates=candidates)
+    best = min(evaluations, key=lambda e: (-e['gain'], len(WorkplaceOptimizer.upgrade_items(e)),
+                                           WorkplaceOptimizer.upgrade_items(e)))
+    path = compiled.plan_upgrade_path(roster, config, max_steps=1)
+    assert WorkplaceOptimizer.upgrade_items(path['steps'][0]) == WorkplaceOptimizer.upgrade_items(best)
+    assert path['steps'][0]['gain'] == pytest.approx(best['gain'])
+
+
+def test_upgrade_path_reuses_unaffected_scores(compiled, cases):
+    roster, config = cases[0]
+    stats = compiled.plan_upgrade_path(roster, config, max_steps=8)['stats']
+    assert stats['reused'] > 0
@@ -0,0 +1,110 @@
+import json
+import random
+
+import pytest
+
+import logic
+from conftest import EFFICIENCY_FILE, make_config, make_roster
+
+pytest.importorskip("numpy")
+
+PRODUCTS = {"trading_station": ["LMD", "Orundum"],
+            "manufacturing_station": ["Pure Gold", "Originium Shard", "Battle Record"]}
+
+
+def synthetic_rules(seed: int, systems: int = 40, rules_per_system: int = 12, operators: int = 400):
+    """在随附规则之上加入随机生成的体系和干员，得到一份规则很多的规则文件"""
+    rng = random.Random(seed)
+    with open(EFFICIENCY_FILE, encoding="utf-8") as f:
+        data = json.load(f)
+    names = [f"合成干员{i}" for i in range(operators)]
+
+    def op(name):
+        elite = rng.choice([0, 0, 1, 2])
+        return f"{name}/{elite}" if elite else name
+
+    for workplace_type in ("trading_station", "manufacturing_station", "power_station", "meeting_room"):
+        group = data["combination_rules"][workplace_type]
+        for s in range(systems):
+            # 名为“通用”的体系走 _optimize_workplace 第一步的扫描，名称含“自动化”的为自动化体系
+            system = "通用" if s == 0 else f"合成自动化{s}" if s % 7 == 1 else f"合成体系{s}"
+            rules = []
+            for _ in range(rules_per_system):
+                rule = {"combo": [op(name) for name in rng.sample(names, rng.choice([1, 1, 2, 3]))],
+                        "efficiency": rng.choice([5, 10, 15, 20, 25, 30, 35, 40]),
+                        "priority": rng.randrange(200)}
+                if rng.random() < 0.2:
+                    rule["apply_each"] = True
+                for key in ("control_center", "dormitory"):
+                    if rng.random() < 0.15:
+                        rule[key] = [op(rng.choice(names))]
+                if workplace_type in PRODUCTS:
+                    rule["product"] = rng.choice(PRODUCTS[workplace_type])
+                rules.append(rule)
+            group[system] = rules
+    return data, names
+
+
+def test_engine_matches_python_on_shipped_rules(compiled, cases):
+    engine = compiled.fork([], {}, vector_engine=True)
+    for roster, config in cases:
+        expected = compiled.solve_both_modes(roster, config)
+        actual = engine.solve_both_modes(roster, config)
+        for a, b in zip(actual[:2], expected[:2]):
+            assert a['plans'] == b['plans']
+            assert a['daily_efficiency'] == b['daily_efficiency']
+        assert actual[2] == expected[2]
+
+
+def test_engine_matches_python_on_large_rule_sets(operator_names):
+    for seed in range(2):
+        data, names = synthetic_rules(seed)
+        plain = logic.WorkplaceOptimizer(data, [], {})
+        vector = plain.fork([], {}, vector_engine=True)
+        for case in range(4):
+            roster = make_roster(operator_names + names, seed * 10 + case)
+            config = make_config(case)
+            expected = plain.solve_both_modes(roster, config)
+            actual = vector.solve_both_modes(roster, config)
+            for a, b in zip(actual[:2], expected[:2]):
+                assert a['plans'] == b['plans']
+                assert a['daily_efficiency'] == b['daily_efficiency']
+
+
+def test_engine_follows_roster_diffs(compiled, cases):
+    roster, config = cases[2]
+    session = logic.create_optimizer(EFFICIENCY_FILE, roster, config, vector_engine=True)
+    session.replan([])
+    changes = [dict(entry, elite=2) for entry in roster if entry['own'] and entry['elite'] < 2][:5]
+    result = session.replan(changes)
+    by_id = {entry['id']: entry for entry in changes}
+    changed = [by_id.get(entry['id'], entry) for entry in roster]
+    assert result['plans'] == compiled.solve(changed, config)['plans']
+
+
+def test_engine_flag_survives_fork(compiled):
+    engine = compiled.fork([], {}, vector_engine=True)
+    assert engine.fork([], {}).vector_engine
+    assert not compiled.vector_engine
+
+
+def _worker_table_flags():
+    table = logic.get_pool_optimizer().get_vector_tables("trading_station", "LMD")[0]
+    return table.synergy.flags.owndata, table.synergy.flags.writeable
+
+
+def test_pool_workers_read_shared_tables(compiled, cases):
+    engine = compiled.fork([], {}, vector_engine=True)
+    pool = logic.create_solver_pool(engine, max_workers=1)
+    try:
+        assert pool.submit(_worker_table_flags).result() == (False, False)
+        for roster, config in cases[:2]:
+            actual = engine.solve_both_modes(roster, config, executor=pool)
+            expected = compiled.solve_both_modes(roster, config)
+            assert [r['plans'] for r in actual[:2]] == [r['plans'] for r in expected[:2]]
+            assert actual[2] == expected[2]
+    finally:
+        pool.shutdown()
+    plain = logic.create_solver_pool(compiled, max_workers=1)
+    assert plain.shared_tables is None
+    plain.shutdown()